@@ -18,27 +18,47 @@ def F_inv(n: int, N: int) -> (int, int, int):
     - int:  Valor de la casilla (i, j)."""
   return int(n/N**4), int((n%N**4)/N**2), int(n%N**2)+1
 
-def SAT_to_sudoku(V: [int]) -> (str, [[int]]):
+def SAT_to_sudoku(V: [int], reduction = None) -> (str, [[int]]):
   """
   Traduce el conjunto de variables a una instancia resuelta de sudoku.
   INPUT:
     - V:  Variables
+    - reduction:  Reduction de sudoku_to_SAT en caso de que V sean las variables
+                  de la version simplificada, None si son las N^6 variables.
   OUTPUT: 
     - str:  Representacion de string de la instancia resuelta del sudoku.
     - [[int]]:    Representacion matricial de la instancia resuelta del sudoku.
   """
-  N = int(len(V)**(1/6))
-  result = str(N) + " "
+  if reduction is not None: V = reduction.expand(V)
+  N = round(len(V)**(1/6))
 
   # Traducimos las variables a una matriz.
   sudoku = [[0 for _ in range(N**2)] for _ in range(N**2)]
   for i in range(len(V)):
     if V[i] == 1:
       i, j, d = F_inv(i, N)
-      if 10 <= d <= 35: d = chr(d+55)
-      elif d == 36: d = "."   
       sudoku[i][j] = d
 
+  return matrix_to_sudoku(sudoku)
+
+def matrix_to_sudoku(sudoku: [[int]]) -> (str, [[int]]):
+  """
+  Traduce la matriz de un sudoku (con digitos numericos) al mismo formato que
+  retorna SAT_to_sudoku.
+  INPUT:
+    - sudoku:   Matriz del sudoku.
+  OUTPUT:
+    - str:  Representacion de string del sudoku.
+    - [[int]]:    Matriz del sudoku, con los digitos mayores a 9 como caracteres.
+  """
+  N = round(len(sudoku)**(1/2))
+  result = str(N) + " "
+  sudoku = [row[:] for row in sudoku]
+  for row in sudoku:
+    for j, d in enumerate(row):
+      if 10 <= d <= 35: row[j] = chr(d+55)
+      elif d == 36: row[j] = "."
+
   # Traducimos la matriz a un string
   for row in sudoku:
     for column in row:
@@ -0,0 +1,250 @@
+#  Benchmark reproducible del pipeline de sudoku por etapas.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+import csv, json, platform, random
+from sys import argv
+from time import perf_counter
+from sudoku_to_SAT import sudoku_to_SAT, read_sudoku
+from laura_SAT import laura_SAT, read_SAT, get_option
+from SAT_to_sudoku import SAT_to_sudoku, matrix_to_sudoku
+from solver_pool import WorkerPool
+
+# Etapas del pipeline, en orden.
+STAGES = ("read_sudoku", "sudoku_to_SAT", "read_SAT", "laura_SAT", "SAT_to_sudoku")
+# Percentiles que se reportan de cada etapa, ademas del minimo y el maximo.
+PERCENTILES = (50, 90, 95)
+
+def generate(N: int, givens: float, rnd: random.Random) -> [[int]]:
+  """
+  Genera una instancia de sudoku con solucion: se parte de un tablero resuelto
+  por patron, se reetiquetan los digitos, se permutan las bandas, las filas de
+  cada banda, las pilas y las columnas de cada pila, y se dejan solo algunas
+  casillas.
+  INPUT:
+    - N:        Grado del tablero.
+    - givens:   Fraccion de casillas dadas.
+    - rnd:      Generador de numeros aleatorios.
+  OUTPUT:
+    - [[int]]:  Matriz de la instancia.
+  """
+  D = N*N
+  lines = lambda: [b*N + i for b in rnd.sample(range(N), N) for i in rnd.sample(range(N), N)]
+  rows, cols = lines(), lines()
+  digits = rnd.sample(range(1, D+1), D)
+  board = [[digits[(N*(r % N) + r//N + c) % D] for c in cols] for r in rows]
+  cells = rnd.sample(range(D*D), D*D - round(givens*D*D))
+  for k in cells: board[k//D][k%D] = 0
+  return board
+
+def valid(sudoku: [[int]], solution: [[int]]) -> bool:
+  """ Indica si solution es una solucion de la instancia sudoku. """
+  D = len(sudoku)
+  N = int(round(D**(1/2)))
+  full = set(range(1, D+1))
+  if len(solution) != D or any(len(row) != D for row in solution): return False
+  if any(sudoku[i][j] and sudoku[i][j] != solution[i][j] for i in range(D) for j in range(D)):
+    return False
+  units = [solution[i] for i in range(D)] + [[solution[i][j] for i in range(D)] for j in range(D)] + \
+          [[solution[N*(k//N) + a][N*(k%N) + b] for a in range(N) for b in range(N)] for k in range(D)]
+  return all(set(u) == full for u in units)
+
+def run_instance(line: str, core: str, heuristic: str) -> ({str: float}, bool):
+  """
+  Resuelve una instancia por el pipeline completo, midiendo cada etapa.
+  INPUT:
+    - line:       Instancia en el formato de read_sudoku.
+    - core:       Nucleo de busqueda de laura_SAT.
+    - heuristic:  Heuristica de decision de laura_SAT.
+  OUTPUT:
+    - {str: float}:   Tiempo de cada etapa.
+    - bool:           Indica si la solucion es valida.
+  """
+  times = {}
+  t = perf_counter()
+  sudoku = read_sudoku(line)
+  times["read_sudoku"] = perf_counter() - t
+  t = perf_counter()
+  sat = sudoku_to_SAT(sudoku)
+  times["sudoku_to_SAT"] = perf_counter() - t
+  t = perf_counter()
+  V, C = read_SAT(sat, core != "dpll")
+  times["read_SAT"] = perf_counter() - t
+  t = perf_counter()
+  V_sol, conflict = laura_SAT(V, C, core, heuristic)
+  times["laura_SAT"] = perf_counter() - t
+  t = perf_counter()
+  string, _ = SAT_to_sudoku(V_sol)
+  times["SAT_to_sudoku"] = perf_counter() - t
+  # La matriz de SAT_to_sudoku usa letras para los digitos mayores que 9.
+  return times, not conflict and valid(sudoku, read_sudoku(string))
+
+def percentile(values: [float], q: float) -> float:
+  """ Percentil q (de 0 a 100) de una lista ordenada, interpolando. """
+  k = (len(values) - 1)*q/100
+  i = int(k)
+  if i + 1 == len(values): return values[i]
+  return values[i] + (values[i+1] - values[i])*(k - i)
+
+def summary(values: [float]) -> {str: float}:
+  """ Numero de mediciones, percentiles, minimo y maximo. """
+  values = sorted(values)
+  result = {"runs": len(values)}
+  for q in PERCENTILES: result["p" + str(q)] = percentile(values, q)
+  result["min"], result["max"] = values[0], values[-1]
+  return result
+
+def benchmark(groups: {str: [str]}, repeat: int = 3, core: str = "dpll",
+              heuristic: str = "order", t_max: float = 60) -> {str: {str: object}}:
+  """
+  Ejecuta el benchmark: cada instancia de cada grupo se resuelve repeat
+  veces, y se resumen los tiempos de cada etapa por grupo. Las ejecuciones
+  corren una a la vez en un proceso aparte (WorkerPool), que se termina si
+  alcanza el tiempo maximo.
+  INPUT:
+    - groups:     Instancias (en el formato de read_sudoku) de cada grupo.
+    - repeat:     Numero de repeticiones.
+    - core:       Nucleo de busqueda de laura_SAT.
+    - heuristic:  Heuristica de decision de laura_SAT.
+    - t_max:      Tiempo maximo de cada ejecucion, en segundos.
+  OUTPUT:
+    - {str: {str: object}}:   Por grupo, el numero de instancias, el de
+                              soluciones invalidas (o ejecuciones que
+                              fallaron), el de ejecuciones que alcanzaron el
+                              tiempo maximo y el resumen de cada etapa (ver
+                              summary) sobre las ejecuciones que terminaron.
+                              Una etapa sin ejecuciones terminadas no aparece.
+  """
+  results = {}
+  with WorkerPool(run_instance, 1) as pool:
+    for name, lines in groups.items():
+      times = {stage: [] for stage in STAGES}
+      invalid = timeouts = 0
+      tasks = [(line, core, heuristic) for line in lines for _ in range(repeat)]
+      for result, _, _, error in pool.map(tasks, t_max):
+        if result is None:
+          if error is None: timeouts += 1
+          else: invalid += 1
+          continue
+        t, ok = result
+        invalid += not ok
+        for stage in STAGES: times[stage].append(t[stage])
+      results[name] = {"instances": len(lines), "invalid": invalid, "timeouts": timeouts,
+                       "stages": {stage: summary(times[stage]) for stage in STAGES if times[stage]}}
+  return results
+
+def write_csv(path: str, results: {str: {str: object}}):
+  """
+  Escribe los resultados en CSV, una fila por grupo y etapa. Las etapas sin
+  ejecuciones terminadas quedan sin tiempos.
+  """
+  keys = ["runs"] + ["p" + str(q) for q in PERCENTILES] + ["min", "max"]
+  with open(path, "w", newline="") as f:
+    w = csv.writer(f)
+    w.writerow(["group", "stage", "invalid", "timeouts"] + keys)
+    for name, r in results.items():
+      for stage in STAGES:
+        s = r["stages"].get(stage, {})
+        w.writerow([name, stage, r["invalid"], r["timeouts"]] + [s.get(k, "") for k in keys])
+
+# Configuracion que debe coincidir con la de la linea base para comparar.
+COMPARABLE = ("core", "heuristic", "seed", "givens", "sizes", "boards", "file", "timeout")
+
+def mismatch(config: {str: object}, baseline: {str: object}) -> [str]:
+  """ Parametros de COMPARABLE en los que config difiere de la linea base. """
+  return [k for k in COMPARABLE if config.get(k) != baseline.get(k)]
+
+def compare(results: {str: {str: object}}, baseline: {str: {str: object}},
+            threshold: float, min_delta: float = 0.0005,
+            floor: float = 0.001) -> [(str, str, float, float, float)]:
+  """
+  Compara las medianas de cada etapa con las de una linea base.
+  INPUT:
+    - results:    Resultados actuales.
+    - baseline:   Resultados de la linea base.
+    - threshold:  Aumento relativo de la mediana a partir del cual una etapa
+                  se considera una regresion.
+    - min_delta:  Aumento minimo de la mediana, en segundos, para considerar
+                  una regresion.
+    - floor:      Etapas cuyas medianas (la base y la actual) estan por debajo
+                  de este tiempo, en segundos, se ignoran: son ruido.
+  OUTPUT:
+    - [(str, str, float, float, float)]:  Grupo, etapa, mediana base, mediana
+                                          actual y cociente, de las etapas que
+                                          empeoraron mas que threshold y que
+                                          min_delta.
+  """
+  regressions = []
+  for name, r in results.items():
+    if name not in baseline: continue
+    for stage, s in r["stages"].items():
+      old = baseline[name]["stages"].get(stage)
+      if old is None or old["p50"] <= 0: continue
+      if max(old["p50"], s["p50"]) < floor or s["p50"] - old["p50"] < min_delta: continue
+      ratio = s["p50"]/old["p50"]
+      if ratio > 1 + threshold: regressions.append((name, stage, old["p50"], s["p50"], ratio))
+  return regressions
+
+
+if __name__ == "__main__":
+    core = get_option(argv, "--core", "cdcl")
+    heuristic = get_option(argv, "--heuristic", "vsids")
+    repeat = int(get_option(argv, "--repeat", "3"))
+    sizes = [int(x) for x in get_option(argv, "--sizes", "3,4,5,6").split(",") if x]
+    boards = int(get_option(argv, "--boards", "2"))
+    givens = float(get_option(argv, "--givens", "0.7"))
+    seed = int(get_option(argv, "--seed", "0"))
+    json_path = get_option(argv, "--json", "benchmark.json")
+    csv_path = get_option(argv, "--csv")
+    baseline_path = get_option(argv, "--baseline")
+    threshold = float(get_option(argv, "--threshold", "0.1"))
+    min_delta = float(get_option(argv, "--min-delta", "0.0005"))
+    floor = float(get_option(argv, "--floor", "0.001"))
+    t_max = float(get_option(argv, "--timeout", "60"))
+    if len(argv) > 2: raise Exception("Numero de argumentos invalidos.")
+    path = argv[1] if len(argv) == 2 else "InstanciasSudoku.txt"
+
+    config = {"core": core, "heuristic": heuristic, "repeat": repeat, "sizes": sizes,
+              "boards": boards, "givens": givens, "seed": seed, "file": path,
+              "timeout": t_max, "python": platform.python_version()}
+    baseline = None
+    if baseline_path:
+        # Antes de medir: solo se comparan ejecuciones con la misma configuracion.
+        f = open(baseline_path, "r")
+        baseline = json.load(f)
+        f.close()
+        different = mismatch(config, baseline["config"])
+        if different:
+            raise Exception("La configuracion no coincide con la de la linea base en: " + ", ".join(different))
+
+    groups = {}
+    if path != "-":
+        f = open(path, "r")
+        groups[path] = [s.strip() for s in f.readlines() if len(s.strip()) > 2]
+        f.close()
+    # Las instancias generadas dependen solo de la semilla, para poder
+    # compararlas entre ejecuciones.
+    rnd = random.Random(seed)
+    for N in sizes:
+        groups["N=" + str(N)] = [matrix_to_sudoku(generate(N, givens, rnd))[0] for _ in range(boards)]
+
+    results = benchmark(groups, repeat, core, heuristic, t_max)
+    report = {"config": config, "results": results}
+    f = open(json_path, "w")
+    json.dump(report, f, indent=2)
+    f.close()
+    if csv_path: write_csv(csv_path, results)
+
+    for name, r in results.items():
+        print(">>> " + name + " (" + str(r["instances"]) + " instancias, " + str(r["invalid"]) + " invalidas, " +
+              str(r["timeouts"]) + " con tiempo agotado)")
+        for stage, s in r["stages"].items():
+            print("\t" + stage.ljust(14) + " mediana: %.6f  p90: %.6f  p95: %.6f" % (s["p50"], s["p90"], s["p95"]))
+
+    if baseline:
+        regressions = compare(results, baseline["results"], threshold, min_delta, floor)
+        for name, stage, old, new, ratio in regressions:
+            print("REGRESION " + name + " " + stage + ": %.6f -> %.6f (x%.2f)" % (old, new, ratio))
+        if regressions: exit(1)
+        print("Sin regresiones respecto a " + baseline_path)
@@ -0,0 +1,71 @@
+#  Base de clausulas compacta para laura_SAT.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+from array import array
+
+class ClauseDB:
+  """
+  Clase que almacena todas las clausulas de un problema CNF en arreglos planos
+  de enteros, en lugar de un objeto por clausula:
+    - lits:     Todos los literales, una clausula despues de la otra.
+    - offsets:  Posicion en lits donde comienza cada clausula. Tiene una entrada
+                extra al final, de modo que la i-esima clausula ocupa
+                lits[offsets[i]:offsets[i+1]] y su longitud es la diferencia.
+  Los nucleos con literales vigilados la consumen con CompactWatched
+  (watched_SAT.py), que resuelve sobre una base de este mismo formato.
+  """
+  def __init__(self, n: int):
+    """
+    Se inicializan los siguientes parametros:
+      self.n:            Numero de variables.
+      self.lits:         Literales de todas las clausulas.
+      self.offsets:      Inicio de cada clausula en lits (mas el final).
+    INPUT:
+      - n:  Numero de variables.
+    """
+    self.n = n
+    self.lits = array("i")
+    self.offsets = array("i", [0])
+
+  @classmethod
+  def from_closures(cls, n: int, closures) -> "ClauseDB":
+    """
+    Crea la base de clausulas a partir de un iterable de clausulas.
+    INPUT:
+      - n:         Numero de variables.
+      - closures:  Iterable con las clausulas como listas de enteros.
+    OUTPUT:
+      - ClauseDB:  Base de clausulas.
+    """
+    db = cls(n)
+    for c in closures: db.add(c)
+    return db
+
+  def add(self, literales: [int]):
+    """
+    Agrega una clausula al final de la base.
+    INPUT:
+      - literales:  Literales de la clausula.
+    """
+    self.lits.extend(literales)
+    self.offsets.append(len(self.lits))
+
+  def __len__(self) -> int:
+    """ Numero de clausulas. """
+    return len(self.offsets) - 1
+
+  def __getitem__(self, i: int) -> [int]:
+    """ Literales de la i-esima clausula. """
+    return self.lits[self.offsets[i]:self.offsets[i+1]].tolist()
+
+  def __iter__(self):
+    """ Recorre las clausulas como listas de enteros. """
+    lits, offsets = self.lits, self.offsets
+    for i in range(len(offsets) - 1):
+      yield lits[offsets[i]:offsets[i+1]].tolist()
+
+  def length(self, i: int) -> int:
+    """ Numero de literales de la i-esima clausula. """
+    return self.offsets[i+1] - self.offsets[i]
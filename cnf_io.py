@@ -0,0 +1,29 @@
+#  Lectura y escritura de archivos cnf, comprimidos o no.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+import gzip, io
+
+def open_cnf(path: str, mode: str = "r"):
+  """
+  Abre un archivo con uno o varios problemas SAT, comprimido con gzip si
+  termina en .gz o con zstd si termina en .zst (este requiere el paquete
+  zstandard, que solo se importa en ese caso).
+  INPUT:
+    - path:  Ubicacion del archivo.
+    - mode:  "r" para leer o "w" para escribir.
+  OUTPUT:
+    - file:  Archivo binario en lectura (ver laura_SAT.chunks_of) y de texto en escritura.
+  """
+  if mode not in ("r", "w"): raise Exception("El modo debe ser 'r' o 'w'.")
+  if path.endswith(".gz"): return gzip.open(path, "rb" if mode == "r" else "wt")
+  if path.endswith(".zst"):
+    try: import zstandard
+    except ImportError:
+      raise Exception("Para leer o escribir archivos .zst hace falta el paquete zstandard.")
+    f = open(path, mode + "b")
+    if mode == "r": return zstandard.ZstdDecompressor().stream_reader(f, closefd=True)
+    return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(f, closefd=True),
+                            encoding="latin-1")
+  return open(path, "rb" if mode == "r" else "w")
@@ -0,0 +1,197 @@
+#  Resolvedor de sudoku por cobertura exacta sobre mascaras de bits.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+from sys import argv
+from sudoku_to_SAT import read_sudoku
+from SAT_to_sudoku import matrix_to_sudoku
+
+class ExactCover:
+  """
+  Clase que representara un sudoku como problema de cobertura exacta: cada
+  opcion (casilla, digito) cubre cuatro restricciones (la casilla, y el digito
+  en su fila, en su columna y en su seccion), y hay que escoger opciones que
+  cubran cada restriccion exactamente una vez. Se resuelve con el algoritmo X
+  de Knuth, pero en lugar de las listas enlazadas de Dancing Links las
+  restricciones cubiertas se guardan como mascaras de bits de los digitos
+  usados en cada fila, columna y seccion (el bit d-1 indica el digito d).
+  En cada nodo se cubren primero las restricciones con una sola opcion
+  (singles desnudos y ocultos), se descarta el nodo si alguna queda sin
+  opciones, y se ramifica sobre la restriccion con menos opciones, sea una
+  casilla (sus digitos posibles) o un digito de una fila, columna o seccion
+  (sus casillas posibles). Como la busqueda no aprende de sus conflictos, es
+  inmediata en 9x9 y 16x16 y en tableros mayores con al menos ~55% de casillas
+  dadas, pero en 25x25 o 36x36 con menos casillas dadas puede tardar minutos u
+  horas; para esos tableros conviene el motor sat con el nucleo cdcl.
+  """
+  def __init__(self, sudoku: [[int]]):
+    """
+    Se inicializan los siguientes parametros:
+      self.D:         Lado del tablero.
+      self.full:      Mascara con los D digitos.
+      self.board:     Valor de cada casilla, por filas (0 si esta vacia).
+      self.used:      Digitos usados en cada unidad: las D filas, luego las D
+                      columnas y luego las D secciones.
+      self.units:     Casillas de cada unidad.
+      self.unit_of:   Unidades (fila, columna y seccion) de cada casilla.
+      self.conflict:  Indica si las casillas dadas se contradicen.
+    INPUT:
+      - sudoku:   Matriz que representa la instancia de sudoku.
+    """
+    D = len(sudoku)
+    N = int(round(D**(1/2)))
+    self.D = D
+    self.full = (1 << D) - 1
+    self.board = [d for row in sudoku for d in row]
+    self.used = [0]*(3*D)
+    self.units = [[i*D + j for j in range(D)] for i in range(D)] + \
+                 [[i*D + j for i in range(D)] for j in range(D)] + \
+                 [[(N*(k//N) + a)*D + N*(k%N) + b for a in range(N) for b in range(N)]
+                  for k in range(D)]
+    self.unit_of = [(c//D, D + c%D, 2*D + N*(c//D//N) + c%D//N) for c in range(D*D)]
+    self.conflict = False
+    for c, d in enumerate(self.board):
+      if d == 0: continue
+      bit = 1 << (d-1)
+      for u in self.unit_of[c]:
+        if self.used[u] & bit: self.conflict = True
+        self.used[u] |= bit
+
+  def propagate(self, board: [int], used: [int]) -> bool:
+    """
+    Cubre las restricciones con una sola opcion hasta que no quede ninguna.
+    Modifica board y used.
+    INPUT:
+      - board:  Valor de cada casilla.
+      - used:   Digitos usados en cada unidad.
+    OUTPUT:
+      - bool:   False si alguna restriccion quedo sin opciones.
+    """
+    full, units, unit_of = self.full, self.units, self.unit_of
+    progress = True
+    while progress:
+      progress = False
+      # Casillas con un solo candidato.
+      for c in range(len(board)):
+        if board[c]: continue
+        r, k, b = unit_of[c]
+        m = full & ~(used[r] | used[k] | used[b])
+        if m == 0: return False
+        if m & (m-1) == 0:
+          board[c] = m.bit_length()
+          used[r] |= m; used[k] |= m; used[b] |= m
+          progress = True
+
+      # Digitos con una sola posicion en una unidad.
+      for u, cells in enumerate(units):
+        once = twice = 0
+        for c in cells:
+          if board[c]: continue
+          r, k, b = unit_of[c]
+          m = full & ~(used[r] | used[k] | used[b])
+          twice |= once & m
+          once |= m
+        if (once | used[u]) != full: return False
+        hidden = once & ~twice
+        while hidden:
+          bit = hidden & -hidden
+          hidden ^= bit
+          for c in cells:
+            if board[c]: continue
+            r, k, b = unit_of[c]
+            if (used[r] | used[k] | used[b]) & bit == 0:
+              board[c] = bit.bit_length()
+              used[r] |= bit; used[k] |= bit; used[b] |= bit
+              progress = True
+              break
+    return True
+
+  def solve(self) -> bool:
+    """
+    Busqueda en profundidad iterativa: cada nodo de la pila es una copia del
+    tablero y de sus mascaras.
+    OUTPUT:
+      - bool:   Indica si el sudoku tiene solucion. En tal caso self.board
+                queda resuelto.
+    """
+    if self.conflict: return False
+    full, units, unit_of, D = self.full, self.units, self.unit_of, self.D
+    stack = [(self.board[:], self.used[:])]
+    while stack:
+      board, used = stack.pop()
+      if not self.propagate(board, used): continue
+
+      # Restriccion con menos opciones, entre las casillas vacias (digitos
+      # posibles) y los digitos faltantes de cada unidad (casillas posibles).
+      cand = {}
+      for c in range(len(board)):
+        if board[c]: continue
+        r, k, b = unit_of[c]
+        cand[c] = full & ~(used[r] | used[k] | used[b])
+      if not cand:
+        self.board = board
+        return True
+      options, best_n = [], D+1
+      for c, m in cand.items():
+        n = bin(m).count("1")
+        if n < best_n:
+          options, best_n = [(c, m)], n
+          if n == 2: break
+      if best_n > 2:
+        for u, cells in enumerate(units):
+          missing = full & ~used[u]
+          while missing:
+            bit = missing & -missing
+            missing ^= bit
+            where = [c for c in cells if cand.get(c, 0) & bit]
+            if len(where) < best_n:
+              options, best_n = [(c, bit) for c in where], len(where)
+          if best_n == 2: break
+
+      # Cada opcion es una casilla con uno o varios digitos. Se apilan en orden
+      # inverso para probar primero la primera opcion y el menor digito.
+      choices = []
+      for c, m in options:
+        while m:
+          bit = m & -m
+          m ^= bit
+          choices.append((c, bit))
+      for c, bit in reversed(choices):
+        r, k, b = unit_of[c]
+        board_p, used_p = board[:], used[:]
+        board_p[c] = bit.bit_length()
+        used_p[r] |= bit; used_p[k] |= bit; used_p[b] |= bit
+        stack.append((board_p, used_p))
+    return False
+
+  def matrix(self) -> [[int]]:
+    """ Tablero actual como matriz. """
+    D = self.D
+    return [self.board[i*D:(i+1)*D] for i in range(D)]
+
+def exact_cover(sudoku: [[int]]) -> (str, [[int]]):
+  """
+  Resuelve una instancia de sudoku por cobertura exacta.
+  INPUT:
+    - sudoku:   Matriz que representa la instancia de sudoku.
+  OUTPUT:
+    - str:      Solucion en el formato de SAT_to_sudoku (el tablero vacio si no
+                tiene solucion, como en laura_SAT).
+    - [[int]]:  Matriz de la solucion.
+  """
+  solver = ExactCover(sudoku)
+  if solver.solve(): return matrix_to_sudoku(solver.matrix())
+  D = len(sudoku)
+  return matrix_to_sudoku([[0]*D for _ in range(D)])
+
+
+if __name__ == "__main__":
+    if len(argv) == 2:
+        f = open(argv[1], "r")
+        sudokus = [s.strip() for s in f.readlines() if len(s.strip()) > 2]
+        f.close()
+        for s in sudokus:
+            print(exact_cover(read_sudoku(s))[0])
+    else:
+        raise Exception("Numero de argumentos invalidos.")
@@ -0,0 +1,281 @@
+#  Heuristicas de decision para laura_SAT.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+import random
+from heapq import heappush, heappop, heapify
+
+# Polaridades disponibles: el signo que se prueba primero en cada decision.
+# None deja el signo que indique la heuristica, y "saved" el ultimo valor que
+# tuvo la variable (phase saving), comenzando por el de la heuristica.
+POLARITIES = (None, "pos", "neg", "random", "saved")
+
+class Heuristic:
+  """
+  Clase base de las heuristicas de decision. Mantiene un heap de variables
+  ordenadas por puntaje (mayor primero, y en caso de empate la de menor indice),
+  con eliminacion perezosa: las variables asignadas se descartan al salir del
+  heap y se vuelven a insertar cuando el nucleo las desasigna.
+  Con todos los puntajes en 0 se decide siempre la menor variable sin asignar,
+  que es el orden original de laura_SAT.
+  Con una semilla se suma a cada puntaje un ruido menor que la mitad de la menor
+  diferencia entre puntajes, de modo que solo se desempatan al azar las
+  variables con el mismo puntaje. Con la polaridad se fija el signo de las
+  decisiones, o con "saved" se decide cada variable con el ultimo valor que
+  tuvo antes de que el nucleo la desasignara.
+  """
+  def __init__(self, n: int, closures: [[int]], polarity: str = None, seed: int = None):
+    """
+    Se inicializan los siguientes parametros:
+      self.n:        Numero de variables.
+      self.score:    Puntaje de cada variable (indice 0 sin usar).
+      self.sign:     Signo preferido de cada variable.
+      self.polarity: Polaridad fija de las decisiones (ver POLARITIES).
+      self.saving:   Indica si se guarda el ultimo valor de cada variable.
+      self.heap:     Heap con entradas (-puntaje, variable).
+      self.in_heap:  Indica si la variable tiene una entrada vigente en el heap.
+    INPUT:
+      - n:         Numero de variables.
+      - closures:  Clausulas iniciales del problema.
+      - polarity:  Polaridad de las decisiones (ver POLARITIES).
+      - seed:      Semilla para desempatar al azar, None para no hacerlo.
+    """
+    if polarity not in POLARITIES:
+      raise Exception("La polaridad debe ser una de: " + ", ".join(p for p in POLARITIES if p))
+    self.n = n
+    self.score = [0.0]*(n+1)
+    self.sign = [1]*(n+1)
+    self.polarity = polarity
+    self.saving = polarity == "saved"
+    self.scores(closures)
+    rng = random.Random(seed)
+    if seed is not None:
+      values = sorted(set(self.score[1:]))
+      gap = min((b - a for a, b in zip(values, values[1:])), default=1.0)
+      for k in range(1, n+1): self.score[k] += rng.random()*gap/2
+    if polarity == "pos": self.sign = [1]*(n+1)
+    elif polarity == "neg": self.sign = [-1]*(n+1)
+    elif polarity == "random": self.sign = [rng.choice((1, -1)) for _ in range(n+1)]
+    self.heap = [(-self.score[k], k) for k in range(1, n+1)]
+    heapify(self.heap)
+    self.in_heap = bytearray(b"\x01")*(n+1)
+
+  def scores(self, closures: [[int]]):
+    """
+    Calcula los puntajes iniciales de las variables. En la clase base todos
+    quedan en 0.
+    INPUT:
+      - closures:  Clausulas iniciales del problema.
+    """
+    pass
+
+  def pick(self, free) -> int:
+    """
+    Retorna el literal de decision: la variable sin asignar de mayor puntaje con
+    su signo preferido, 0 si todas estan asignadas.
+    INPUT:
+      - free:  Funcion que indica si la k-esima variable esta sin asignar.
+    OUTPUT:
+      - int:  Literal de decision.
+    """
+    heap, score, in_heap = self.heap, self.score, self.in_heap
+    while heap:
+      s, k = heappop(heap)
+      # Entrada vieja de una variable cuyo puntaje cambio.
+      if -s != score[k]: continue
+      in_heap[k] = 0
+      if free(k): return k*self.sign[k]
+    return 0
+
+  def unassign(self, l: int):
+    """
+    Notifica que la variable del literal l quedo sin asignar.
+    INPUT:
+      - l:  Literal que era True.
+    """
+    k = l if l > 0 else -l
+    if self.saving: self.sign[k] = 1 if l > 0 else -1
+    if not self.in_heap[k]:
+      self.in_heap[k] = 1
+      heappush(self.heap, (-self.score[k], k))
+
+  def conflict(self, literales: [int]):
+    """
+    Notifica los literales que participaron en un conflicto. En la clase base
+    no se hace nada.
+    INPUT:
+      - literales:  Literales del conflicto.
+    """
+    pass
+
+class VSIDS(Heuristic):
+  """
+  Variable State Independent Decaying Sum: cada conflicto aumenta la actividad
+  de sus variables y el incremento crece geometricamente, de modo que los
+  conflictos recientes pesan mas.
+  """
+  def __init__(self, n: int, closures: [[int]], polarity: str = None, seed: int = None,
+               decay: float = 0.95):
+    """
+    Se inicializan los siguientes parametros:
+      self.inc:    Incremento actual de la actividad.
+      self.decay:  Factor de decaimiento.
+    INPUT:
+      - n:         Numero de variables.
+      - closures:  Clausulas iniciales del problema.
+      - polarity:  Polaridad de las decisiones (ver POLARITIES).
+      - seed:      Semilla para desempatar al azar.
+      - decay:     Factor de decaimiento de la actividad.
+    """
+    super().__init__(n, closures, polarity, seed)
+    self.inc = 1.0
+    self.decay = decay
+
+  def conflict(self, literales: [int]):
+    """
+    Aumenta la actividad de las variables del conflicto.
+    INPUT:
+      - literales:  Literales del conflicto.
+    """
+    score, heap, in_heap, inc = self.score, self.heap, self.in_heap, self.inc
+    for l in literales:
+      k = abs(l)
+      score[k] += inc
+      if in_heap[k]: heappush(heap, (-score[k], k))
+    self.inc /= self.decay
+
+    # Reescalamos para evitar desbordamientos y reconstruimos el heap si las
+    # entradas viejas lo hicieron crecer demasiado.
+    if self.inc > 1e100:
+      self.inc *= 1e-100
+      for k in range(1, self.n+1): score[k] *= 1e-100
+      self.rebuild()
+    elif len(heap) > 4*self.n:
+      self.rebuild()
+
+  def rebuild(self):
+    """ Reconstruye el heap solo con las entradas vigentes. """
+    self.heap = [(-self.score[k], k) for k in range(1, self.n+1) if self.in_heap[k]]
+    heapify(self.heap)
+
+class JeroslowWang(Heuristic):
+  """
+  Jeroslow-Wang de dos lados: J(l) es la suma de 2^-|c| sobre las clausulas c
+  donde aparece l. Se decide la variable con mayor J(x) + J(-x) y se le da el
+  signo del lado con mayor J.
+  """
+  def scores(self, closures: [[int]]):
+    J = {}
+    for c in closures:
+      w = 2.0**-len(c)
+      for l in c: J[l] = J.get(l, 0.0) + w
+    for k in range(1, self.n+1):
+      pos, neg = J.get(k, 0.0), J.get(-k, 0.0)
+      self.score[k] = pos + neg
+      self.sign[k] = 1 if pos >= neg else -1
+
+class DLIS(Heuristic):
+  """
+  Dynamic Largest Individual Sum: se decide el literal que aparece en mas
+  clausulas binarias sin satisfacer y se hace True. Si el nucleo da acceso a
+  sus clausulas binarias actuales (en laura_SAT, C.closures[1]) el conteo es
+  dinamico; si no, se usa el conteo sobre las clausulas binarias iniciales.
+  """
+  def __init__(self, n: int, closures: [[int]], polarity: str = None, seed: int = None,
+               binaries=None):
+    """
+    INPUT:
+      - n:         Numero de variables.
+      - closures:  Clausulas iniciales del problema.
+      - polarity:  Polaridad de las decisiones (ver POLARITIES).
+      - seed:      Semilla para desempatar al azar.
+      - binaries:  Funcion que retorna las clausulas binarias actuales (objetos
+                   con atributo literales), None si no estan disponibles.
+    """
+    super().__init__(n, closures, polarity, seed)
+    self.binaries = binaries
+
+  def scores(self, closures: [[int]]):
+    count = self.count(c for c in closures if len(c) == 2)
+    for k in range(1, self.n+1):
+      self.score[k], self.sign[k] = self.rank(count.get(k, 0), count.get(-k, 0))
+
+  def count(self, closures) -> {int: int}:
+    """
+    Cuenta las apariciones de cada literal en las clausulas binarias.
+    INPUT:
+      - closures:  Clausulas binarias (listas de literales).
+    """
+    count = {}
+    get = count.get
+    for c in closures:
+      for l in c: count[l] = get(l, 0) + 1
+    return count
+
+  def rank(self, pos: int, neg: int) -> (float, int):
+    """
+    Retorna el puntaje de una variable y su signo dadas las apariciones de
+    sus literales positivo y negativo.
+    """
+    return (pos, 1) if pos >= neg else (neg, -1)
+
+  def pick(self, free) -> int:
+    if self.binaries is None: return super().pick(free)
+    # Despues de la propagacion las clausulas binarias sin satisfacer solo
+    # tienen literales de variables libres.
+    count = self.count(c.literales for c in self.binaries())
+    if not count: return super().pick(free)
+    # Los empates se rompen con el puntaje inicial, que con semilla incluye el
+    # ruido aleatorio, y luego por el menor indice.
+    score = self.score
+    best, tie, lit = -1, 0.0, 0
+    for l in count:
+      # Cada variable se evalua una sola vez, desde su literal positivo si
+      # aparece.
+      if l < 0 and -l in count: continue
+      k = l if l > 0 else -l
+      s, sign = self.rank(count.get(k, 0), count.get(-k, 0))
+      if s > best or (s == best and (score[k] > tie or (score[k] == tie and k < abs(lit)))):
+        best, tie, lit = s, score[k], k*(self.sign[k] if self.polarity else sign)
+    return lit
+
+class MOMS(DLIS):
+  """
+  Maximum Occurrences in clauses of Minimum Size, sobre las clausulas binarias:
+  se decide la variable con mayor (f(x) + f(-x))*2^2 + f(x)*f(-x), donde f es
+  el numero de apariciones del literal, con el signo que deja mas literales
+  falsos (y por lo tanto mas clausulas unitarias para propagar).
+  """
+  def rank(self, pos: int, neg: int) -> (float, int):
+    return (pos + neg)*4 + pos*neg, (1 if neg >= pos else -1)
+
+# Heuristicas disponibles, por nombre.
+HEURISTICS = {
+  "order": Heuristic,
+  "vsids": VSIDS,
+  "jw": JeroslowWang,
+  "dlis": DLIS,
+  "moms": MOMS,
+}
+
+def make_heuristic(name: str, n: int, closures: [[int]], binaries=None,
+                   polarity: str = None, seed: int = None) -> Heuristic:
+  """
+  Crea la heuristica de decision indicada.
+  INPUT:
+    - name:      Nombre de la heuristica (ver HEURISTICS).
+    - n:         Numero de variables.
+    - closures:  Clausulas iniciales del problema.
+    - binaries:  Funcion que retorna las clausulas binarias actuales del nucleo,
+                 si este las mantiene (solo la usan dlis y moms).
+    - polarity:  Polaridad de las decisiones (ver POLARITIES).
+    - seed:      Semilla para desempatar al azar, None para no hacerlo.
+  OUTPUT:
+    - Heuristic:  Heuristica inicializada.
+  """
+  if name not in HEURISTICS:
+    raise Exception("La heuristica debe ser una de: " + ", ".join(HEURISTICS))
+  if name in ("dlis", "moms"):
+    return HEURISTICS[name](n, closures, polarity, seed, binaries)
+  return HEURISTICS[name](n, closures, polarity, seed)
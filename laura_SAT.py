@@ -3,25 +3,38 @@
 #       - David Segura
 #       - Amin Arriaga
 
+import io, mmap, os
+from itertools import chain
 from sys import argv
+from watched_SAT import Watched, CompactWatched
+from clause_db import ClauseDB
+from cnf_io import open_cnf
+from heuristics import Heuristic, make_heuristic
+from solver_stats import SolverStats
+from restarts import RESTARTS, make_restarts
+
+# Nucleos de busqueda disponibles para laura_SAT.
+CORES = ("dpll", "watched", "cdcl")
 
 class Closure:
   """
   Clase que representara la estructura de datos de las clausuras, donde almacenaremos
   las variables que contiene junto a sus flags y el numero de literales.
   """
-  def __init__(self):
+  def __init__(self, literales: [int] = None):
     """
     Se inicializan los siguientes parametros:
       self.literales:    Conjunto de literales que aparecen en la clausura.
       self.N:            Numero de literales de la clausura.
       self.satisfied:    Variable booleana que indica si una clausula ya fue satisfecha.
-      self.backup:       Diccionario que utilizaremos como nube para guardar la informacion actual.
+      self.original:     Literales iniciales de la clausura (delete no la modifica).
+    INPUT:
+      - literales:  Literales iniciales, por defecto ninguno.
     """
-    self.literales = []
-    self.N = 0
+    self.literales = literales if literales is not None else []
+    self.original = self.literales
+    self.N = len(self.literales)
     self.satisfied = False
-    self.backup = {}
 
   def add(self, var: int):
     """
@@ -32,38 +45,29 @@ class Closure:
     self.literales.append(var)
     self.N += 1
 
-  def delete(self, indexes: [int]) -> bool:
+  def delete(self, l: int) -> [int]:
     """
-    Elimina el i-esimo literal de la clausura.
+    Elimina todas las apariciones del literal l de la clausura. La lista de
+    literales se reemplaza por una nueva, de modo que la anterior sirve para
+    deshacer la operacion.
     INPUT:  
-      i:  Indice del literal.
+      - l:  Literal.
     OUTPUT:
-      bool:  Indica si la clausula quedo vacia.
-    """
-    p = 0
-    for i in indexes:
-      self.literales.pop(i-p)
-      p += 1
-    self.N -= len(indexes)
-    return self.N == 0
-
-  def save(self, key: int):
+      - [int]:  Literales que tenia la clausura antes de eliminar l.
     """
-    Metodo que guarda una copia de la instancia.
-    INPUT:
-      - key: llave donde se guardara la copia de la clausula
-    """
-    self.backup[key] = (self.literales.copy(), self.N, self.satisfied)
+    old = self.literales
+    self.literales = [x for x in old if x != l]
+    self.N = len(self.literales)
+    return old
 
-  def restaure(self, key: int):
+  def restaure(self, literales: [int]):
     """
-    Metodo que restaurara una copia guardada mediante la llave indicada.
+    Metodo que restaurara los literales que tenia la clausura antes de un delete.
     INPUT:
-      - key: llave donde se encuentra la copia de la clausula
-      - pop: variable que indica si se requiere eliminar la copia o no, por
-             defecto es False.
+      - literales: Literales retornados por delete.
     """
-    self.literales, self.N, self.satisfied = self.backup.pop(key)
+    self.literales = literales
+    self.N = len(literales)
 
 class Variable:
   """
@@ -76,12 +80,9 @@ class Variable:
       self.sign:         Signo de la variable que comienza sin asignar
       self.closures:     Arreglo con las clausulas a la que pertenece la variable y 
                          el signo que tiene dentro de ella.
-      self.backup:       Diccionario que utilizaremos para guardar el signo actual
-                         de la variable.
     """
     self.sign = 0
     self.closures = []
-    self.backup = {}
   
   def assign(self, sign: int) -> bool:
     """
@@ -102,22 +103,6 @@ class Variable:
       - closure:  Clausura a la que pertenece la variable.
     """
     self.closures.append(closure)
-  
-  def save(self, key: int):
-    """
-    Metodo que guarda una copia del signo.
-    INPUT:
-      - key: Llave donde se guardara la copia del signo.
-    """
-    self.backup[key] = self.sign
-
-  def restaure(self, key: int):
-    """
-    Metodo que restablecera una copia guardada mediante la llave indicada.
-    INPUT:
-      - key: llave donde se encuentra la copia del signo
-    """
-    self.sign = self.backup.pop(key)
 
 class CNF:
   """
@@ -126,107 +111,264 @@ class CNF:
   def __init__(self, closures):
     """
     Se inicializan los siguientes parametros:
-      self.closures:     Clausulas en el problema
+      self.closures:     Clausulas sin satisfacer agrupadas por numero de literales.
+                         Cada grupo es un diccionario (usado como conjunto ordenado)
+                         para poder sacar una clausula en O(1).
       self.N:     Numero de clausulas sin satisfacer.
-      self.backup:       Diccionario que utilizaremos para guardar el numero de clausulas actual.
+      self.trail:        Cambios realizados desde el inicio de la busqueda, en orden.
+                         Cada entrada es un entero k (se asigno la variable k), una
+                         Closure (se satisfizo la clausula) o una tupla (Closure,
+                         literales) (se eliminaron literales de la clausula).
+      self.conflict:     Ultima clausula que quedo vacia.
     """
-    self.closures = closures
-    self.N = sum(sum(1 for c_p in c) for c in closures)
-    self.backup = {}
-
-  def save(self, key: int):
-    """
-    Metodo que guarda una copia del numero de clausulas actual.
-    INPUT:
-      - key:  Llave donde se guardara la copia de N.
-    """
-    self.backup[key] = self.N
-
-  def restaure(self, key: int):
-    """
-    Metodo que restablecera una copia guardada mediante la llave indicada.
-    INPUT:
-      - key: Llave donde se encuentra la copia de N.
-    """
-    self.N = self.backup.pop(key)
+    self.closures = [dict.fromkeys(c) for c in closures]
+    self.N = sum(len(c) for c in self.closures)
+    self.trail = []
+    self.conflict = None
 
 
-def read_SAT(text: str) -> ([Variable], CNF):
+def chunks_of(source, size: int = 1 << 20) -> str:
   """
-  Dado un string con un problema SAT en forma cnf, retorna el arreglo con las
-  variables y otro arreglo con las clausuras.
+  Generador que recorre en una sola pasada un problema SAT por bloques de
+  aproximadamente size caracteres que terminan en un salto de linea, de modo
+  que nunca se copia ni se parte todo el texto de una vez.
   INPUT:
-    - text:   String con el problema SAT.
+    - source:  String, bytes, mmap o archivo (de texto o binario) con el problema.
+    - size:    Tamaño aproximado de cada bloque.
   OUTPUT:
-    - [Variable]:  Variables inicializadas en 0. No confundir con False, que a efectos
-                  practicos lo consideramos como -1 y True como 1.
-    - CNF:   Instancia de la clase CNF con las clausulas del problema.
+    - str:  Cada bloque del problema.
   """
+  if isinstance(source, str):
+    i = 0
+    while i < len(source):
+      j = min(i + size, len(source))
+      if j < len(source):
+        k = source.find("\n", j)
+        j = len(source) if k == -1 else k+1
+      yield source[i:j]
+      i = j
+    return
+
+  if isinstance(source, (bytes, bytearray, memoryview)):
+    source = io.BytesIO(source)
+  rest = ""
+  while True:
+    block = source.read(size)
+    if not block: break
+    if not isinstance(block, str): block = block.decode("latin-1")
+    block = rest + block
+    k = block.rfind("\n")
+    if k == -1:
+      rest = block
+      continue
+    rest = block[k+1:]
+    yield block[:k+1]
+  if rest: yield rest
 
-  metadata = ""
-  while metadata != "p":
-    metadata = text[0]
-
-    if metadata == "c":
-      # Ignoramos la linea de comentario.
-      if text.find("\n") == -1: break
-      text = text[text.find("\n")+1:]
-
-    elif metadata == "p":
+def read_header(chunks) -> (int, int, str):
+  """
+  Consume las lineas de comentario hasta el encabezado 'p cnf' y lo interpreta.
+  INPUT:
+    - chunks:  Iterador de bloques del problema (ver chunks_of).
+  OUTPUT:
+    - int:  Numero de variables.
+    - int:  Numero de clausuras.
+    - str:  Resto del bloque despues del encabezado.
+    En caso de terminar los bloques sin conseguir un encabezado retorna None.
+  """
+  for block in chunks:
+    start = 0
+    while start < len(block):
+      end = block.find("\n", start)
+      if end == -1: end = len(block)
+      tokens = block[start:end].split()
+      start = end+1
+      # Ignoramos las lineas vacias y de comentario.
+      if not tokens or tokens[0][0] == "c": continue
+      if tokens[0] != "p":
+        raise Exception("Formato no valido, el metadato debe ser 'c' para comentarios y " + \
+                        "'p' para el encabezado.")
       # Verificamos el formato
-      formato = text[2:5]
-      if formato != "cnf":
+      if len(tokens) != 4 or tokens[1] != "cnf":
         raise Exception("El formato del problema SAT debe ser cnf.")
-
-      # Obtenemos el numero de variables.
-      text = text[6:] 
-      N = int(text[: text.find(" ")])
-      V = [Variable() for _ in range(N)]
-
-      # Obtenemos el numero de clausuras.
-      text = text[text.find(" ")+1:]
-      num_C = int(text[: text.find("\n")])
+      N, num_C = int(tokens[2]), int(tokens[3])
       if num_C == 0:
         raise Exception("Debe haber por lo menos una clausura.")
+      return N, num_C, block[start:]
+  return None
 
-      # Obtenemos las clausuras.
-      C_aux = [Closure() for _ in range(num_C)]
-      C = [[]]
-      text = text[text.find("\n")+1:]
-      nums = [int(t) for t in text.split()]
-      # Si el ultimo numero es un 0, lo quitamos.
-      if nums[len(nums)-1] == 0: nums.pop()
-      i = 0
-      for n in nums:
-        last = n
-        if n == 0:
-          for k in range(0, C_aux[i].N - len(C)):
-            C.append([])
-          C[C_aux[i].N - 1].append(C_aux[i])
-          i += 1
-        elif abs(n) > N: 
-          raise Exception("Se indicaron", N, "variables, pero aparece la variable",
-                          n, "en la " + str(i) + "-esima clausura.")
-        else: 
-          C_aux[i].add(n)
-          V[abs(n)-1].add_closure(C_aux[i])
-      if last != 0:
-        C[C_aux[i].N - 1].append(C_aux[i])
-      if i+1 != num_C:
+def read_closures(chunks, rest: str, N: int, num_C: int, tail: [str]) -> [int]:
+  """
+  Generador que consume los bloques con las num_C clausuras del problema y
+  retorna los literales de cada una apenas se termina de leer. Cada bloque se
+  convierte a enteros de una sola vez y se parte en clausuras buscando los
+  ceros. La lectura se detiene en la linea de un nuevo encabezado 'p' (o en
+  un '%').
+  INPUT:
+    - chunks:  Iterador de bloques del problema (despues del encabezado).
+    - rest:    Resto del bloque del encabezado.
+    - N:       Numero de variables.
+    - num_C:   Numero de clausuras.
+    - tail:    Lista donde se agrega, al terminar, el texto que queda despues
+               de las clausuras a partir del siguiente encabezado ("" si no hay).
+  OUTPUT:
+    - [int]:  Literales de cada clausura.
+  """
+  i = 0
+  pending = []
+  next_header = ""
+  for block in chain([rest], chunks):
+    # Si hay lineas que no son clausuras, las filtramos.
+    if "c" in block or "p" in block or "%" in block:
+      kept = []
+      lines = block.split("\n")
+      for pos, line in enumerate(lines):
+        s = line.lstrip()
+        if not s or s[0] not in "cp%":
+          kept.append(line)
+        elif s[0] == "%":
+          for _ in chunks: pass
+          break
+        elif s[0] == "p":
+          next_header = "\n".join(lines[pos:])
+          break
+      block = "\n".join(kept)
+
+    nums = list(map(int, block.split()))
+    if nums and (max(nums) > N or min(nums) < -N):
+      j = next(j for j, n in enumerate(nums) if abs(n) > N)
+      raise Exception("Se indicaron", N, "variables, pero aparece la variable",
+                      nums[j], "en la " + str(i + nums[:j].count(0)) + "-esima clausura.")
+    start = 0
+    while True:
+      try: j = nums.index(0, start)
+      except ValueError: break
+      if i == num_C:
         raise Exception("El numero de clausuras indicadas no coincide con las dadas.")
-
-    else:
-      raise Exception("Formato no valido, el metadato debe ser 'c' para comentarios y " + \
-                      "'p' para el encabezado.")
-
-  return V, CNF(C) 
+      literales = pending + nums[start:j] if pending else nums[start:j]
+      if not literales:
+        raise Exception("La " + str(i) + "-esima clausura esta vacia.")
+      yield literales
+      pending = []
+      i += 1
+      start = j+1
+    pending += nums[start:]
+    if next_header: break
+
+  # La ultima clausura puede no terminar en 0.
+  if pending:
+    if i == num_C:
+      raise Exception("El numero de clausuras indicadas no coincide con las dadas.")
+    yield pending
+    i += 1
+  if i != num_C:
+    raise Exception("El numero de clausuras indicadas no coincide con las dadas.")
+  tail.append(next_header)
+
+def read_SAT(text, compact: bool = False) -> ([Variable], CNF):
+  """
+  Dado un problema SAT en forma cnf, retorna el arreglo con las variables y
+  otro arreglo con las clausuras. El problema se lee en una sola pasada y cada
+  clausura se agrega a las estructuras apenas se lee.
+  INPUT:
+    - text:     String con el problema SAT. Tambien puede ser bytes, un mmap o
+                un archivo abierto.
+    - compact:  Indica si las clausulas se guardan en una ClauseDB (arreglos
+                planos) en lugar de objetos Variable y Closure.
+  OUTPUT:
+    - [Variable]:  Variables inicializadas en 0. No confundir con False, que a efectos
+                  practicos lo consideramos como -1 y True como 1. Si compact
+                  es True, el numero de variables.
+    - CNF:   Instancia de la clase CNF con las clausulas del problema. Si
+             compact es True, la ClauseDB con las clausulas.
+  """
+  chunks = chunks_of(text)
+  header = read_header(chunks)
+  if header is None:
+    raise Exception("No se consiguio el encabezado 'p cnf' del problema SAT.")
+  N, num_C, rest = header
+  tail = []
+  V, C = build_SAT(N, read_closures(chunks, rest, N, num_C, tail), compact)
+  # No deben quedar clausuras despues de las indicadas.
+  if tail[0] or next(chunks, None) is not None:
+    raise Exception("El numero de clausuras indicadas no coincide con las dadas.")
+  return V, C
+
+def build_SAT(N: int, closures, compact: bool = False) -> ([Variable], CNF):
+  """
+  Construye las estructuras del problema SAT directamente a partir de sus
+  clausulas, sin pasar por el texto en formato cnf.
+  INPUT:
+    - N:         Numero de variables.
+    - closures:  Iterable con las clausulas como listas de enteros.
+    - compact:   Indica si las clausulas se guardan en una ClauseDB.
+  OUTPUT:
+    - [Variable]:  Variables inicializadas en 0 (o su numero, si compact es True).
+    - CNF:         Clausulas del problema (ClauseDB si compact es True).
+  """
+  if compact: return N, ClauseDB.from_closures(N, closures)
+
+  V = [Variable() for _ in range(N)]
+  occurrences = [v.closures for v in V]
+  C = [[]]
+  for literales in closures:
+    # Creamos la clausura y la agregamos a sus variables y a su grupo.
+    c = Closure(literales)
+    for l in literales: occurrences[(l if l > 0 else -l) - 1].append(c)
+    if c.N > len(C): C.extend([] for _ in range(c.N - len(C)))
+    C[c.N - 1].append(c)
+  return V, CNF(C)
+
+def read_SAT_file(path: str, use_mmap: bool = True, compact: bool = False) -> ([Variable], CNF):
+  """
+  Lee un problema SAT de un archivo, opcionalmente mapeandolo a memoria.
+  INPUT:
+    - path:      Ubicacion del archivo. Si termina en .gz o .zst se
+                 descomprime mientras se lee (ver open_cnf).
+    - use_mmap:  Indica si se usa mmap en lugar de leer el archivo por bloques.
+    - compact:   Indica si las clausulas se guardan en una ClauseDB.
+  OUTPUT:
+    - [Variable]:  Variables (o su numero, si compact es True).
+    - CNF:         Clausulas (ClauseDB si compact es True).
+  """
+  if path.endswith((".gz", ".zst")):
+    with open_cnf(path) as f: return read_SAT(f, compact)
+  with open(path, "rb") as f:
+    if use_mmap and os.fstat(f.fileno()).st_size > 0:
+      with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return read_SAT(m, compact)
+    return read_SAT(f, compact)
+
+def iter_SAT(source, compact: bool = False):
+  """
+  Generador que lee uno por uno los problemas SAT de un texto con varios
+  problemas concatenados, cada uno con su encabezado 'p cnf' (como los que
+  escribe sudoku_to_SAT.py con --stream). Se lee en una sola pasada: lo que
+  read_closures deja despues de las clausulas de un problema es el comienzo
+  del siguiente, y cada problema se construye antes de leer el resto.
+  INPUT:
+    - source:   Problemas SAT (ver chunks_of), por ejemplo un archivo abierto
+                con open_cnf.
+    - compact:  Indica si las clausulas se guardan en una ClauseDB.
+  OUTPUT:
+    - ([Variable], CNF):  Variables y clausulas de cada problema (ver read_SAT).
+  """
+  chunks = chunks_of(source)
+  rest = ""
+  while True:
+    header = read_header(chain([rest], chunks) if rest else chunks)
+    if header is None: return
+    N, num_C, rest = header
+    tail = []
+    yield build_SAT(N, read_closures(chunks, rest, N, num_C, tail), compact)
+    rest = tail[0]
 
 def update_C(V: [Variable], C: CNF, k: int) -> bool:
   """ 
   Actualiza las clausuras de C dada la (k-1)-esima variable de V. Si aparece
   un literal de la variable con valor False, se elimina dicho literal, en caso
   contrario se elimina toda la clausula. En caso de quedar alguna clausura vacia,
-  significa que dio False (conflicto).
+  significa que dio False (conflicto). Cada cambio se registra en C.trail.
   INPUT:
     - V:  Variables.
     - C:  Clausulas.
@@ -234,35 +376,26 @@ def update_C(V: [Variable], C: CNF, k: int) -> bool:
   OUTPUT:
     - bool: Indica si hubo algun conflicto (clausura vacia).
   """
-  # Obtenemos todas las clausulas en las que aparece la variable.
-  c = V[k-1].closures
-  for i in range(len(c)):
-    if c[i].satisfied: continue
-
-    pos = c[i].N - 1
-    index = C.closures[pos].index(c[i])
-
-    # Verificamos los literales de la clausula.
-    delete = []
-    satisfied = False
-    for p, l in enumerate(c[i].literales):
-      # Si el literal aparece con valor True, la clausula queda satisfecha.
-      if k*V[k-1].sign == l:
-        c[i].satisfied = True
-        C.closures[pos].pop(index)
-        C.N -= 1
-        satisfied = True
-        break
-
-      # Si el literal aparece con valor False, se elimina de la clausula.
-      elif l == -k*V[k-1].sign:
-        delete.append(p)
-
-    # Eliminamos los literales falsos de la clausula.
-    if delete and not satisfied:
-      if c[i].delete(delete): return True
-      C.closures[pos].pop(index)
-      C.closures[c[i].N - 1].append(c[i])
+  l = k*V[k-1].sign
+  # Recorremos todas las clausulas en las que aparece la variable.
+  for c in V[k-1].closures:
+    if c.satisfied: continue
+
+    # Si el literal aparece con valor True, la clausula queda satisfecha.
+    if l in c.literales:
+      c.satisfied = True
+      del C.closures[c.N - 1][c]
+      C.N -= 1
+      C.trail.append(c)
+
+    # Si el literal aparece con valor False, se elimina de la clausula.
+    elif -l in c.literales:
+      del C.closures[c.N - 1][c]
+      C.trail.append((c, c.delete(-l)))
+      if c.N == 0:
+        C.conflict = c
+        return True
+      C.closures[c.N - 1][c] = None
   # No hubo conflicto.
   return False
 
@@ -278,131 +411,277 @@ def verify_units(V: [Variable], C: CNF) -> bool:
             True y False, o alguna clausura vacia).
   """
   # Mientras hayan clausulas unitarias.
-  while len(C.closures[0]) > 0:
+  while C.closures[0]:
     # Obtenemos una clausula unitaria y hacemos True su literal.
-    c = C.closures[0].pop()
+    c = C.closures[0].popitem()[0]
     C.N -= 1
     c.satisfied = True
+    C.trail.append(c)
 
     k = abs(c.literales[0])
-    sign = int(abs(c.literales[0])/c.literales[0])
+    sign = 1 if c.literales[0] > 0 else -1
     # Verificamos que no haya conflicto al asignar un valor a la variable o
     # al actualizar las demas clausulas en consecuencia.
+    if V[k-1].sign == 0: C.trail.append(k)
     if V[k-1].assign(sign) or update_C(V, C, k): return True
   return False
 
-def search_amin_zero(V: [Variable]) -> (int):
-  """ 
-  Dado un arreglo de enteros, retornara la primera posicion donde
-  haya un cero.
+def count_units(V: [Variable], C: CNF, stats: SolverStats) -> bool:
+  """
+  Lo mismo que verify_units, contando en stats sus iteraciones y las
+  clausulas que recorre update_C. Se usa en lugar de verify_units solo si se
+  recolectan estadisticas.
   INPUT:
-    - V:  Arreglo con las variables.
+    - V:      Variables.
+    - C:      Clausulas.
+    - stats:  Estadisticas de la busqueda.
   OUTPUT:
-    - int:  Menor indice tal que se encuentre una variable con valor 0.
+    - bool: Indica si hubo algun conflicto.
   """
-  for i in range(len(V)):
-    if V[i].sign == 0:
-      return i
-  return -1
+  while C.closures[0]:
+    c = C.closures[0].popitem()[0]
+    C.N -= 1
+    c.satisfied = True
+    C.trail.append(c)
+    stats.propagations += 1
+
+    k = abs(c.literales[0])
+    sign = 1 if c.literales[0] > 0 else -1
+    if V[k-1].sign == 0: C.trail.append(k)
+    if V[k-1].assign(sign): return True
+    stats.touched += len(V[k-1].closures)
+    if update_C(V, C, k): return True
+  stats.measure(C.trail)
+  return False
 
-def restaure(V: [Variable], C: CNF, key: int):
+def rewind(V: [Variable], C: CNF, mark: int, h: Heuristic = None):
   """
-    Funcion que restablece los valores guardados en el 'backup' tanto de las  
-    clausulas como del signo de las variables.
+    Funcion que deshace, en orden inverso, los cambios registrados en C.trail
+    a partir de la posicion mark, tanto de las clausulas como del signo de
+    las variables.
     INPUT:
-      - V:   signos de variables a restablecer
-      - C:   clausulas a restablecer
-      - key: llave donde se encuentran guardados los datos a restablecer.
+      - V:    Variables a restablecer.
+      - C:    Clausulas a restablecer.
+      - mark: Tamaño que tenia el trail en el estado a restablecer.
+      - h:    Heuristica a la que se notifican las variables desasignadas.
     """
-  C.restaure(key)
-  for c in C.closures:
-    for c_p in c:
-      c_p.restaure(key)
-  for v in V: v.restaure(key)
+  trail, closures = C.trail, C.closures
+  while len(trail) > mark:
+    change = trail.pop()
+    if type(change) is int:
+      if h is not None: h.unassign(change*V[change-1].sign)
+      V[change-1].sign = 0
+    elif type(change) is tuple:
+      c, literales = change
+      if c.N > 0: del closures[c.N - 1][c]
+      c.restaure(literales)
+      closures[c.N - 1][c] = None
+    else:
+      change.satisfied = False
+      closures[change.N - 1][change] = None
+      C.N += 1
+
+def solution(V: [Variable]) -> [int]:
+  """
+  Retorna el signo de cada variable, tomando como False las no asignadas.
+  INPUT:
+    - V:  Variables.
+  """
+  return [v.sign if v.sign != 0 else -1 for v in V]
+
+def pack_solution(V: [int]) -> bytes:
+  """
+  Empaqueta una asignacion en un bit por variable (1 si es True), para
+  enviarla entre procesos.
+  INPUT:
+    - V:  Valores de las variables (1 True, -1 o 0 False).
+  OUTPUT:
+    - bytes:  La k-esima variable es el bit k%8 del byte k//8 (desde 0).
+  """
+  packed = bytearray((len(V) + 7) >> 3)
+  for k, v in enumerate(V):
+    if v > 0: packed[k >> 3] |= 1 << (k & 7)
+  return bytes(packed)
+
+def unpack_solution(packed: bytes, n: int) -> [int]:
+  """
+  Inversa de pack_solution.
+  INPUT:
+    - packed:  Asignacion empaquetada.
+    - n:       Numero de variables.
+  OUTPUT:
+    - [int]:  Valores de las variables (1 True, -1 False).
+  """
+  return [1 if packed[k >> 3] >> (k & 7) & 1 else -1 for k in range(n)]
+
+def closures_of(C: CNF) -> [[int]]:
+  """
+  Retorna los literales de cada clausula sin satisfacer de C.
+  INPUT:
+    - C:  Clausulas (CNF o ClauseDB).
+  OUTPUT:
+    - [[int]]:  Clausulas como listas de enteros.
+  """
+  if isinstance(C, ClauseDB): return list(C)
+  return [c_p.literales for c in C.closures for c_p in c]
 
-def laura_SAT(V: [Variable], C: CNF) -> ([int], bool):
+def laura_SAT(V: [Variable], C: CNF, core: str = "dpll", heuristic: str = "order",
+              polarity: str = None, seed: int = None, stats: SolverStats = None,
+              restarts: str = None) -> ([int], bool):
   """ 
   SAT-Solver
+  INPUT:
+    - V:  Variables (o su numero, si C es una ClauseDB).
+    - C:  Clausuras (CNF o ClauseDB). Una ClauseDB solo la consumen los nucleos
+          con literales vigilados (CompactWatched), que resuelven sobre sus
+          arreglos sin copiar las clausulas; el nucleo "dpll" no la acepta.
+    - core: Nucleo de busqueda: "dpll" (propagacion sobre todas las clausulas de
+            la variable), "watched" (dos literales vigilados) o "cdcl" (dos
+            literales vigilados con aprendizaje de clausulas y backjumping).
+    - heuristic:  Heuristica de decision (ver heuristics.HEURISTICS). Por
+                  defecto "order", la menor variable sin asignar.
+    - polarity:   Signo que se prueba primero en las decisiones (ver
+                  heuristics.POLARITIES). Por defecto el de la heuristica.
+    - seed:       Semilla para desempatar al azar las decisiones.
+    - stats:      Estadisticas donde se cuenta la busqueda (ver
+                  solver_stats.py), None para no recolectarlas.
+    - restarts:   Politica de reinicio (ver restarts.RESTARTS), None para no
+                  reiniciar. Con reinicios la polaridad por defecto es "saved",
+                  de modo que despues de reiniciar cada variable se decide con
+                  el ultimo valor que tuvo.
+  OUTPUT:
+    - [int]:  Valores de las variables en caso de haber solucion, [] en caso
+              contrario
+    - bool:   Indica si hubo conflictos.
+  """
+  if core not in CORES:
+    raise Exception("El nucleo debe ser uno de: " + ", ".join(CORES))
+  if restarts is not None and polarity is None: polarity = "saved"
+  if isinstance(C, ClauseDB):
+    if core == "dpll":
+      raise Exception("El nucleo dpll no usa una ClauseDB, debe ser watched o cdcl.")
+    return CompactWatched(C.n, C, heuristic, polarity, seed, stats, restarts).solve(
+      "cdcl" if core == "cdcl" else "dpll")
+  if core == "watched":
+    return Watched(len(V), closures_of(C), heuristic, polarity, seed, stats, restarts).solve("dpll")
+  elif core == "cdcl":
+    return Watched(len(V), closures_of(C), heuristic, polarity, seed, stats, restarts).solve("cdcl")
+
+  if restarts not in RESTARTS:
+    raise Exception("La politica de reinicio debe ser una de: " + ", ".join(r for r in RESTARTS if r))
+  h = make_heuristic(heuristic, len(V), closures_of(C),
+                     lambda: C.closures[1] if len(C.closures) > 1 else (), polarity, seed)
+  return dpll(V, C, h, stats, restarts)
+
+def laura_SAT_models(V: [Variable], C: CNF, limit: int = None, core: str = "dpll",
+                     heuristic: str = "order", polarity: str = None, seed: int = None,
+                     project: [int] = None, stats: SolverStats = None,
+                     restarts: str = None) -> [[int]]:
+  """
+  Enumera los modelos de un problema con los nucleos de literales vigilados
+  (ver Watched.enumerate_models): cada modelo se bloquea con una clausula y la
+  busqueda continua desde donde estaba. Con el nucleo "dpll" se usa el modo
+  dpll de dichos nucleos.
+  INPUT:
+    - V, C, core, heuristic, polarity, seed, stats, restarts:  Lo mismo que en
+                                                          laura_SAT.
+    - limit:    Numero maximo de modelos, None para todos.
+    - project:  Variables sobre las que se distinguen los modelos. Por
+                defecto, todas.
+  OUTPUT:
+    - [[int]]:  Valores de las variables de cada modelo.
+  """
+  if core not in CORES:
+    raise Exception("El nucleo debe ser uno de: " + ", ".join(CORES))
+  if restarts is not None and polarity is None: polarity = "saved"
+  if isinstance(C, ClauseDB): w = CompactWatched(C.n, C, heuristic, polarity, seed, stats, restarts)
+  else: w = Watched(len(V), closures_of(C), heuristic, polarity, seed, stats, restarts)
+  return w.enumerate_models("cdcl" if core == "cdcl" else "dpll", limit, project)
+
+def dpll(V: [Variable], C: CNF, h: Heuristic, stats: SolverStats = None,
+         restarts: str = None) -> ([int], bool):
+  """ 
+  DPLL iterativo con backtracking cronologico sobre el trail de C. En lugar de
+  una llamada recursiva por nivel de decision se usa una pila explicita, donde
+  cada nivel solo guarda la marca del trail, su literal de decision y si ya se
+  probo el signo contrario. Un reinicio regresa por el mismo trail hasta antes
+  de la primera decision.
   INPUT:
     - V:  Variables.
     - C:  Clausuras.
+    - h:  Heuristica de decision.
+    - stats:  Estadisticas de la busqueda, None para no recolectarlas.
+    - restarts:   Politica de reinicio (ver restarts.RESTARTS).
   OUTPUT:
     - [int]:  Valores de las variables en caso de haber solucion, [] en caso
               contrario
     - bool:   Indica si hubo conflictos.
   """
-  # Propagacion unitaria.
-  if verify_units(V, C):
-    return [0 for _ in range(len(V))], True
-
-  # Si no quedan clausulas, terminamos.
-  if C.N == 0:
-    sol = []
-    for v in V:
-      if v.sign != 0: sol.append(v.sign)
-      else: sol.append(-1)
-    return sol, False
-
-  # Obtenemos una llave.
-  key = 0
-  while key in V[0].backup: key += 1
-
-  # Hacemos un backup del estado actual.
-  C.save(key)
-  for c in C.closures:
-    for c_p in c: c_p.save(key)
-  C_save = [c.copy() for c in C.closures]
-  for v in V: v.save(key)
-
-  for i in range(2):
-    sign = 1-2*i
-    # Hacemos una copia para no modificar los originales.
-    # Verificamos cual es la siguiente variable a la que no se le ha
-    # asignado un valor.
-    k = search_amin_zero(V) + 1
-    # Asignamos primero -1 luego 1 a la (k-1)-esima variable.
-    V[k-1].sign = sign
-    # Actualizamos las clausuras debido a la nueva asignacion.
-    if update_C(V, C, k):
-      
-      # Si dio conflicto con el negativo, no hay solucion en esta rama.
-      if sign < 0:
-        return [0 for _ in range(len(V))], True
-
-      # Si dio conflicto con el positivo, restauramos lo valores de las
-      # clausulas y las variables y pasamos al negativo.
-      C.closures = [c.copy() for c in C_save]
-      restaure(V, C, key)
-      continue
-
-    # Si no hubo conflictos y no hay mas clausuras, retornamos las variables.
-    if C.N == 0:
-      sol = []
-      for v in V:
-        if v.sign != 0: sol.append(v.sign)
-        else: sol.append(-1)
-      return sol, False
-
-    # Si hay mas clausuras, verificamos si hay alguna solucion en futuras ramas
-    sol, conflake = laura_SAT(V, C)
-    # Si una de las ramas logro retornar el resultado, retornamos dicho resultado
-    if not conflake:
-      return sol, False
-
-    if sign > 0:
-      # Restauramos los valores de las clausulas y las variables.
-      C.closures = [c.copy() for c in C_save]
-      restaure(V, C, key)
-
-  # Si no hubo un resultado en futuras ramas, conflicto.
-  return [0 for _ in range(len(V))], True
+  free = lambda k: V[k-1].sign == 0
+  restarts = make_restarts(restarts)
+  propagate = verify_units if stats is None else lambda V, C: count_units(V, C, stats)
+  stack = []
+  while True:
+    # Propagacion unitaria.
+    conflict = propagate(V, C)
+    if not conflict:
+      # Si no quedan clausulas, terminamos.
+      if C.N == 0: return solution(V), False
+
+      # Obtenemos el literal de decision segun la heuristica y lo asignamos,
+      # marcando el estado actual en el trail.
+      l = h.pick(free)
+      stack.append([len(C.trail), l, False])
+      if stats is not None:
+        stats.decision(len(stack), C.trail)
+        stats.touched += len(V[abs(l)-1].closures)
+      conflict = assign(V, C, l)
+      if not conflict: continue
+
+    # Regresamos al ultimo nivel que no haya probado ambos signos.
+    while conflict:
+      h.conflict(C.conflict.original if C.conflict else ())
+      if stats is not None: stats.conflict(C.trail)
+      if restarts is not None and stack and restarts.conflict():
+        rewind(V, C, stack[0][0], h)
+        stack.clear()
+        if stats is not None: stats.restarts += 1
+        break
+      while stack and stack[-1][2]:
+        rewind(V, C, stack.pop()[0], h)
+      # Si no quedan niveles, no hay solucion.
+      if not stack: return [0 for _ in range(len(V))], True
+      level = stack[-1]
+      rewind(V, C, level[0], h)
+      level[2] = True
+      if stats is not None:
+        stats.backtracks += 1
+        stats.touched += len(V[abs(level[1])-1].closures)
+      conflict = assign(V, C, -level[1])
+
+def assign(V: [Variable], C: CNF, l: int) -> bool:
+  """
+  Hace True el literal de decision l y actualiza las clausulas en consecuencia.
+  INPUT:
+    - V:  Variables.
+    - C:  Clausulas.
+    - l:  Literal.
+  OUTPUT:
+    - bool: Indica si hubo algun conflicto (clausura vacia).
+  """
+  k = abs(l)
+  V[k-1].sign = 1 if l > 0 else -1
+  C.trail.append(k)
+  return update_C(V, C, k)
 
-def output(V: [int], result: int) -> str:
+def output(V: [int], result: int, stats: SolverStats = None) -> str:
   """
   Retorna en un string el resultado del SAT-Solver.
   INPUT:
     - result:   Conclusion del SAT-Solver.
     - V:    Variables.
+    - stats:    Estadisticas de la busqueda, que se agregan como lineas de
+                comentario 'c'. None para no agregarlas.
   OUTPUT:
     - str:   Resultado del SAT-Solver
   """
@@ -410,10 +689,67 @@ def output(V: [int], result: int) -> str:
   if result == 1:
     for i, v in enumerate(V):
       text += "\nv " + str(int(v*(i+1)))
+  if stats is not None: text += "\n" + stats.lines()
   return text
 
+def get_option(args: [str], flag: str, default: str = None) -> str:
+  """
+  Busca una opcion de la forma 'flag VALOR' en los argumentos, la elimina de
+  ellos y retorna su valor.
+  INPUT:
+    - args:     Argumentos de la linea de comandos.
+    - flag:     Nombre de la opcion.
+    - default:  Valor en caso de no indicarse la opcion.
+  OUTPUT:
+    - str:  Valor de la opcion.
+  """
+  if flag not in args: return default
+  i = args.index(flag)
+  if i+1 == len(args):
+    raise Exception("La opcion " + flag + " requiere un valor.")
+  value = args[i+1]
+  del args[i:i+2]
+  return value
+
 
 if __name__ == "__main__":
+    core = get_option(argv, "--core", "dpll")
+    heuristic = get_option(argv, "--heuristic", "order")
+    polarity = get_option(argv, "--polarity")
+    seed = get_option(argv, "--seed")
+    if seed is not None: seed = int(seed)
+    compact = "--compact" in argv
+    if compact: argv.remove("--compact")
+    # Con --stream FILE puede tener varios problemas concatenados.
+    stream = "--stream" in argv
+    if stream: argv.remove("--stream")
+    # Numero maximo de modelos a enumerar (0 para todos).
+    models = get_option(argv, "--models")
+    # Los modelos siempre se enumeran con los nucleos de literales vigilados.
+    if compact and core == "dpll" and models is None:
+        raise Exception("--compact requiere el nucleo watched o cdcl.")
+    # Con --progress K se imprimen las estadisticas cada K decisiones.
+    progress = get_option(argv, "--progress")
+    restarts = get_option(argv, "--restarts")
+    collect = "--stats" in argv or progress is not None
+    if "--stats" in argv: argv.remove("--stats")
+
+    def solve(V, C) -> str:
+        """ Resuelve el problema (o enumera sus modelos) y retorna la salida. """
+        stats = None
+        if collect:
+            stats = SolverStats()
+            if progress is not None:
+                stats.progress = lambda s: print("c progreso: " + s.line(), flush=True)
+                stats.every = int(progress)
+        if models is None:
+            V_result, conflake = laura_SAT(V, C, core, heuristic, polarity, seed, stats, restarts)
+            return output(V_result, int(not conflake), stats)
+        V_results = laura_SAT_models(V, C, int(models) or None, core, heuristic, polarity, seed,
+                                     None, stats, restarts)
+        if not V_results: return output([0]*(V if isinstance(V, int) else len(V)), 0, stats)
+        return "\n".join(output(V_result, 1) for V_result in V_results) + \
+               "\nc " + str(len(V_results)) + " modelos" + ("\n" + stats.lines() if stats else "")
     if len(argv) == 1:
         def input_sat():
             sat = "p cnf "
@@ -424,19 +760,16 @@ if __name__ == "__main__":
 
         sat = input_sat()
         while sat != "p cnf  \n":
-          V, C = read_SAT(sat)
-          V_result, conflake = laura_SAT(V, C)
-          print("\n" + output(V_result, int(not conflake)) + "\n")
+          V, C = read_SAT(sat, compact)
+          print("\n" + solve(V, C) + "\n")
           sat = input_sat()
 
+    elif len(argv) == 2 and stream:
+        with open_cnf(argv[1]) as f:
+            for i, (V, C) in enumerate(iter_SAT(f, compact)):
+                print("\nc instancia " + str(i+1) + "\n" + solve(V, C) + "\n")
     elif len(argv) == 2:
-        file_sats = argv[1]
-        f = open(file_sats, "r")
-        sat = f.read()
-        f.close()
-
-        V, C = read_SAT(sat)
-        V_result, conflake = laura_SAT(V, C)
-        print("\n" + output(V_result, int(not conflake)) + "\n")
+        V, C = read_SAT_file(argv[1], compact=compact)
+        print("\n" + solve(V, C) + "\n")
     else:
         raise Exception("Numero de argumentos invalidos.")
@@ -0,0 +1,321 @@
+#  Preprocesamiento de formulas en CNF antes de la busqueda.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+from sys import argv
+from watched_SAT import Watched
+from laura_SAT import laura_SAT, read_SAT_file, build_SAT, closures_of, output, get_option
+
+class Preprocessor:
+  """
+  Clase que representara una formula en CNF durante el preprocesamiento. Se
+  aplican, en orden: propagacion de unitarias, sondeo de literales fallidos,
+  subsuncion y resolucion auto-subsumida, y eliminacion acotada de variables
+  (que incluye la de literales puros). La formula resultante solo tiene las
+  variables que siguen apareciendo en alguna clausula, renumeradas de 1 a m
+  como en Reduction, para que la busqueda no decida variables libres. Los
+  valores de las demas (fijadas o eliminadas) se reconstruyen con extend a
+  partir de un modelo de dicha formula.
+  """
+  def __init__(self, n: int, closures: [[int]]):
+    """
+    Se inicializan los siguientes parametros:
+      self.n:           Numero de variables.
+      self.clauses:     Clausulas activas (None en las eliminadas).
+      self.occurs:      Indices de las clausulas activas donde aparece cada
+                        literal (indexado por literal, como en Watched).
+      self.value:       Valor fijo de cada literal (1 True, -1 False, 0 libre).
+      self.queue:       Literales fijados que aun no se propagan.
+      self.eliminated:  Indica si cada variable fue eliminada.
+      self.stack:       Clausulas eliminadas, con el literal de la variable
+                        eliminada (pivote), en el orden en que se eliminaron.
+      self.conflict:    Indica si se dedujo la clausula vacia.
+      self.variables:   Variable original de cada variable de la formula
+                        resultante (la v-esima es self.variables[v-1]). Se
+                        calcula en closures.
+      self.stats:       Numero de literales fallidos, clausulas subsumidas,
+                        literales eliminados por resolucion auto-subsumida y
+                        variables eliminadas.
+    INPUT:
+      - n:          Numero de variables.
+      - closures:   Clausulas como listas de literales.
+    """
+    self.n = n
+    self.clauses = []
+    self.occurs = [set() for _ in range(2*n+1)]
+    self.value = [0]*(2*n+1)
+    self.queue = []
+    self.eliminated = [False]*(n+1)
+    self.stack = []
+    self.conflict = False
+    self.variables = []
+    self.stats = {"failed": 0, "subsumed": 0, "strengthened": 0, "eliminated": 0}
+    for c in closures: self.add(c)
+    self.propagate()
+
+  def add(self, literales: [int]):
+    """
+    Agrega una clausula, eliminando literales repetidos o False y descartando
+    las tautologias y las ya satisfechas.
+    INPUT:
+      - literales:  Literales de la clausula.
+    """
+    c = []
+    seen = set()
+    for l in literales:
+      if abs(l) > self.n:
+        raise Exception("Se indicaron", self.n, "variables, pero aparece la variable", l)
+      if -l in seen or self.value[l] > 0: return
+      if l not in seen and self.value[l] == 0:
+        seen.add(l)
+        c.append(l)
+    if len(c) == 0: self.conflict = True
+    elif len(c) == 1: self.assign(c[0])
+    else:
+      for l in c: self.occurs[l].add(len(self.clauses))
+      self.clauses.append(c)
+
+  def assign(self, l: int):
+    """ Fija el literal l como True. """
+    if self.value[l] < 0: self.conflict = True
+    if self.value[l]: return
+    self.value[l] = 1
+    self.value[-l] = -1
+    self.queue.append(l)
+
+  def remove(self, i: int):
+    """ Elimina la i-esima clausula. """
+    for l in self.clauses[i]: self.occurs[l].discard(i)
+    self.clauses[i] = None
+
+  def strengthen(self, i: int, l: int):
+    """ Elimina el literal l de la i-esima clausula. """
+    c = self.clauses[i]
+    c.remove(l)
+    self.occurs[l].discard(i)
+    if len(c) == 1:
+      self.remove(i)
+      self.assign(c[0])
+
+  def propagate(self) -> bool:
+    """
+    Propaga los literales fijados: elimina las clausulas que satisfacen y los
+    quita (negados) de las demas.
+    OUTPUT:
+      - bool:   Indica si hubo un conflicto.
+    """
+    while self.queue and not self.conflict:
+      l = self.queue.pop()
+      for i in list(self.occurs[l]): self.remove(i)
+      for i in list(self.occurs[-l]): self.strengthen(i, -l)
+    return self.conflict
+
+  def probe(self, limit: int = 100000):
+    """
+    Sondeo de literales fallidos: se supone cada literal y se propaga (con los
+    literales vigilados de Watched); si hay un conflicto, su negacion se fija.
+    INPUT:
+      - limit:  Numero maximo de literales a sondear.
+    """
+    w = Watched(self.n, self.active())
+    for l in w.units: w.assign(l)
+    if w.empty or w.propagate() is not None:
+      self.conflict = True
+      return
+    for v in range(1, self.n+1):
+      if limit <= 0: break
+      if self.eliminated[v] or not (self.occurs[v] or self.occurs[-v]): continue
+      for l in (v, -v):
+        if w.value[l] != 0: continue
+        limit -= 1
+        w.decide(l)
+        confl = w.propagate()
+        w.backtrack(0)
+        if confl is not None:
+          self.stats["failed"] += 1
+          self.assign(-l)
+          w.assign(-l)
+          if w.propagate() is not None: self.conflict = True
+          if self.propagate(): return
+
+  def subsume(self):
+    """
+    Subsuncion y resolucion auto-subsumida: se elimina toda clausula que
+    contenga a otra, y si una clausula C contiene a otra D salvo por un literal
+    negado, dicho literal se elimina de C.
+    """
+    order = sorted((i for i, c in enumerate(self.clauses) if c), key=lambda i: len(self.clauses[i]))
+    for i in order:
+      c = self.clauses[i]
+      if c is None or self.conflict: continue
+      for l in c:
+        # Clausulas que contienen a c (con l) o a c con l negado. Se filtran
+        # por el literal de c con menos apariciones.
+        best = min((x for x in c if x != l), key=lambda x: len(self.occurs[x]))
+        for sign in (l, -l):
+          candidates = self.occurs[sign] & self.occurs[best]
+          for j in list(candidates):
+            d = self.clauses[j]
+            if j == i or d is None or len(d) < len(c): continue
+            if not all(x in d for x in c if x != l): continue
+            if sign == l:
+              self.remove(j)
+              self.stats["subsumed"] += 1
+            else:
+              self.strengthen(j, -l)
+              self.stats["strengthened"] += 1
+        if self.clauses[i] is None: break
+      if self.propagate(): return
+
+  def eliminate(self, grow: int = 0, max_length: int = 20, max_occurs: int = 16):
+    """
+    Eliminacion acotada de variables: una variable se reemplaza por todos los
+    resolventes (no tautologicos) de sus clausulas positivas con las negativas
+    si estos no tienen, en total, mas clausulas ni mas literales que las
+    clausulas originales (mas grow), ni alguno tiene mas de max_length
+    literales. Acotar tambien los literales evita reemplazar las clausulas
+    binarias de la codificacion del sudoku por clausulas largas, que propagan
+    menos. Las variables que aparecen con un solo signo (literales puros) se
+    eliminan sin agregar resolventes.
+    INPUT:
+      - grow:         Numero de clausulas (y de literales) que puede crecer la
+                      formula por cada variable eliminada.
+      - max_length:   Longitud maxima de los resolventes.
+      - max_occurs:   Numero maximo de apariciones de cada signo de la
+                      variable para intentar eliminarla.
+    """
+    occurs = self.occurs
+    order = sorted((v for v in range(1, self.n+1) if not self.eliminated[v] and self.value[v] == 0),
+                   key=lambda v: len(occurs[v])*len(occurs[-v]))
+    for v in order:
+      if self.conflict: return
+      pos, neg = list(occurs[v]), list(occurs[-v])
+      if not pos and not neg: continue
+      if pos and neg and (len(pos) > max_occurs or len(neg) > max_occurs): continue
+      resolvents = []
+      limit = len(pos) + len(neg) + grow
+      size = sum(len(self.clauses[i]) for i in pos + neg) + grow
+      for i in pos:
+        for j in neg:
+          r = set(self.clauses[i]) | set(self.clauses[j])
+          r.discard(v)
+          r.discard(-v)
+          if any(-x in r for x in r): continue
+          size -= len(r)
+          if len(r) > max_length or len(resolvents) == limit or size < 0: break
+          resolvents.append(r)
+        else: continue
+        break
+      else:
+        # Guardamos las clausulas de la variable para reconstruir su valor.
+        for pivot, side in ((v, pos), (-v, neg)):
+          for i in side:
+            self.stack.append((pivot, self.clauses[i]))
+            self.remove(i)
+        self.eliminated[v] = True
+        self.stats["eliminated"] += 1
+        for r in resolvents: self.add(r)
+        self.propagate()
+
+  def run(self, probe: bool = True, subsume: bool = True, eliminate: bool = True) -> bool:
+    """
+    Aplica las etapas indicadas del preprocesamiento.
+    OUTPUT:
+      - bool:   Indica si se dedujo que la formula es insatisfacible.
+    """
+    if probe and not self.conflict: self.probe()
+    if subsume and not self.conflict: self.subsume()
+    if eliminate and not self.conflict:
+      self.eliminate()
+      if subsume and not self.conflict: self.subsume()
+    return self.conflict
+
+  def active(self) -> [[int]]:
+    """ Clausulas activas, con la numeracion original de las variables. """
+    return [c[:] for c in self.clauses if c is not None]
+
+  def closures(self) -> [[int]]:
+    """
+    Clausulas de la formula preprocesada, con las variables renumeradas (ver
+    self.variables, que se actualiza). Si la formula es insatisfacible se
+    retorna una formula trivialmente insatisfacible, como en Reduction.
+    OUTPUT:
+      - [[int]]:  Literales de cada clausula.
+    """
+    if self.conflict:
+      self.variables = [1]
+      return [[1], [-1]]
+    clauses = self.active()
+    self.variables = sorted({abs(l) for c in clauses for l in c})
+    index = {v: k+1 for k, v in enumerate(self.variables)}
+    return [[index[l] if l > 0 else -index[-l] for l in c] for c in clauses]
+
+  def extend(self, V: [int]) -> [int]:
+    """
+    Reconstruye un modelo de la formula original a partir de uno de la
+    formula preprocesada: se toman los valores de las variables de esta y de
+    las fijadas, las demas se hacen False, y se recorren las clausulas
+    eliminadas en orden inverso haciendo True el pivote de las que no se
+    satisfacen.
+    INPUT:
+      - V:  Valores de las variables de la formula preprocesada (1 True,
+            -1 False).
+    OUTPUT:
+      - [int]:  Valores de las n variables originales.
+    """
+    full = [1 if self.value[v] > 0 else -1 for v in range(1, self.n+1)]
+    for v, x in zip(self.variables, V): full[v-1] = 1 if x > 0 else -1
+    V = full
+    sat = lambda l: V[abs(l)-1]*l > 0
+    for pivot, c in reversed(self.stack):
+      if not any(sat(l) for l in c):
+        V[abs(pivot)-1] = 1 if pivot > 0 else -1
+    return V
+
+  def to_SAT(self) -> str:
+    """
+    Retorna la formula preprocesada en formato cnf. La correspondencia con las
+    variables originales se guarda en un comentario 'c map', como en Reduction.
+    """
+    closures = ["".join(str(l) + " " for l in c) + "0\n" for c in self.closures()]
+    return "c map " + " ".join(str(v) for v in self.variables) + "\n" + \
+           "p cnf " + str(len(self.variables)) + " " + str(len(closures)) + "\n" + "".join(closures)
+
+
+def preprocess_SAT(V, C, compact: bool = False, eliminate: bool = True):
+  """
+  Etapa de preprocesamiento entre read_SAT y laura_SAT.
+  INPUT:
+    - V:          Variables (o su numero, si C es una ClauseDB).
+    - C:          Clausulas (CNF o ClauseDB).
+    - compact:    Indica si la formula preprocesada se guarda en una ClauseDB.
+    - eliminate:  Indica si se eliminan variables. Sin eliminacion la formula
+                  preprocesada tiene los mismos modelos que la original
+                  (sobre las variables que siguen apareciendo), como hace
+                  falta para enumerarlos.
+  OUTPUT:
+    - ([Variable], CNF):  Variables y clausulas de la formula preprocesada
+                          (renumeradas), como las retorna build_SAT.
+    - Preprocessor:       Preprocesador, para reconstruir el modelo con extend.
+  """
+  n = V if isinstance(V, int) else len(V)
+  p = Preprocessor(n, closures_of(C))
+  p.run(eliminate=eliminate)
+  closures = p.closures()
+  V, C = build_SAT(len(p.variables), closures, compact)
+  return V, C, p
+
+
+if __name__ == "__main__":
+    core = get_option(argv, "--core", "dpll")
+    heuristic = get_option(argv, "--heuristic", "order")
+    if len(argv) == 2:
+        V, C = read_SAT_file(argv[1])
+        V, C, p = preprocess_SAT(V, C, core != "dpll")
+        print("c " + ", ".join(k + ": " + str(x) for k, x in p.stats.items()))
+        V_result, conflake = laura_SAT(V, C, core, heuristic)
+        if not conflake: V_result = p.extend(V_result)
+        print("\n" + output(V_result, int(not conflake)) + "\n")
+    else:
+        raise Exception("Numero de argumentos invalidos.")
@@ -0,0 +1,202 @@
+#  Presolver de sudoku por propagacion de restricciones.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+from sys import argv
+from sudoku_to_SAT import read_sudoku, assignment
+
+class Presolver:
+  """
+  Clase que representara un tablero de sudoku con los candidatos de cada
+  casilla como mascaras de bits (el bit d-1 indica el digito d). Aplica
+  singles desnudos, singles ocultos y reducciones seccion-linea hasta que no
+  haya progreso. Las casillas se numeran por filas (c = i*D + j) y las
+  unidades son las D filas, luego las D columnas y luego las D secciones.
+  """
+  def __init__(self, sudoku: [[int]]):
+    """
+    Se inicializan los siguientes parametros:
+      self.N:         Grado del tablero de sudoku.
+      self.D:         Lado del tablero (N^2).
+      self.board:     Valor de cada casilla (0 si esta vacia).
+      self.used:      Digitos colocados en cada unidad.
+      self.allowed:   Digitos no eliminados de cada casilla por las
+                      reducciones seccion-linea.
+      self.units:     Casillas de cada unidad.
+      self.unit_of:   Unidades (fila, columna y seccion) de cada casilla.
+      self.conflict:  Indica si el tablero no tiene solucion.
+    INPUT:
+      - sudoku:   Matriz que representa la instancia de sudoku.
+    """
+    D = len(sudoku)
+    N = int(round(D**(1/2)))
+    self.N, self.D = N, D
+    self.full = (1 << D) - 1
+    self.board = [0]*(D*D)
+    self.used = [0]*(3*D)
+    self.allowed = [self.full]*(D*D)
+    self.units = [[i*D + j for j in range(D)] for i in range(D)] + \
+                 [[i*D + j for i in range(D)] for j in range(D)] + \
+                 [[(N*(k//N) + a)*D + N*(k%N) + b for a in range(N) for b in range(N)]
+                  for k in range(D)]
+    self.unit_of = [(c//D, D + c%D, 2*D + N*(c//D//N) + c%D//N) for c in range(D*D)]
+    self.conflict = False
+    for i in range(D):
+      for j in range(D):
+        if sudoku[i][j]: self.place(i*D + j, sudoku[i][j])
+
+  def place(self, c: int, d: int):
+    """
+    Coloca el digito d en la casilla c.
+    INPUT:
+      - c:  Casilla.
+      - d:  Digito.
+    """
+    bit = 1 << (d-1)
+    self.board[c] = d
+    for u in self.unit_of[c]:
+      if self.used[u] & bit: self.conflict = True
+      self.used[u] |= bit
+
+  def candidates(self, c: int) -> int:
+    """ Mascara de los candidatos de la casilla c (0 si no esta vacia). """
+    if self.board[c]: return 0
+    r, k, b = self.unit_of[c]
+    return self.allowed[c] & ~(self.used[r] | self.used[k] | self.used[b])
+
+  def singles(self) -> bool:
+    """
+    Coloca los singles desnudos (casillas con un solo candidato) y los singles
+    ocultos (digitos con una sola posicion posible en una unidad).
+    OUTPUT:
+      - bool:   Indica si se coloco algun digito.
+    """
+    progress = False
+    for c in range(self.D*self.D):
+      if self.board[c]: continue
+      m = self.candidates(c)
+      if m == 0:
+        self.conflict = True
+        return False
+      if m & (m-1) == 0:
+        self.place(c, m.bit_length())
+        progress = True
+
+    for u, cells in enumerate(self.units):
+      # once: digitos que aparecen en algun candidato; twice: en al menos dos.
+      once = twice = 0
+      for c in cells:
+        m = self.candidates(c)
+        twice |= once & m
+        once |= m
+      if (once | self.used[u]) != self.full:
+        self.conflict = True
+        return False
+      hidden = once & ~twice
+      while hidden:
+        bit = hidden & -hidden
+        hidden ^= bit
+        for c in cells:
+          if self.candidates(c) & bit:
+            self.place(c, bit.bit_length())
+            progress = True
+            break
+    return progress
+
+  def box_line(self) -> bool:
+    """
+    Reducciones seccion-linea: si dentro de una seccion un digito solo puede ir
+    en una fila (o columna), se elimina de dicha fila fuera de la seccion; y si
+    dentro de una fila (o columna) solo puede ir en una seccion, se elimina del
+    resto de la seccion.
+    OUTPUT:
+      - bool:   Indica si se elimino algun candidato.
+    """
+    D = self.D
+    progress = False
+    for box in range(2*D, 3*D):
+      for line in (0, 1):
+        progress |= self.reduce(self.units[box], line)
+    for line in range(2*D):
+      progress |= self.reduce(self.units[line], 2)
+    return progress
+
+  def reduce(self, cells: [int], kind: int) -> bool:
+    """
+    Para cada digito cuyas posiciones en cells caen en una sola unidad del tipo
+    kind (0 fila, 1 columna, 2 seccion), lo elimina del resto de esa unidad.
+    INPUT:
+      - cells:  Casillas de una unidad.
+      - kind:   Tipo de la otra unidad.
+    OUTPUT:
+      - bool:   Indica si se elimino algun candidato.
+    """
+    where = {}
+    for c in cells:
+      m = self.candidates(c)
+      while m:
+        bit = m & -m
+        m ^= bit
+        where.setdefault(bit, set()).add(self.unit_of[c][kind])
+    progress = False
+    inside = set(cells)
+    for bit, units in where.items():
+      if len(units) != 1: continue
+      for c in self.units[units.pop()]:
+        if c not in inside and self.candidates(c) & bit:
+          self.allowed[c] &= ~bit
+          progress = True
+    return progress
+
+  def solve(self) -> bool:
+    """
+    Aplica las reglas hasta que no haya progreso. Las reducciones seccion-linea
+    solo se usan cuando los singles no avanzan.
+    OUTPUT:
+      - bool:   Indica si el tablero quedo resuelto.
+    """
+    while not self.conflict:
+      if self.singles(): continue
+      if self.conflict or not self.box_line(): break
+    return not self.conflict and all(self.board)
+
+  def matrix(self) -> [[int]]:
+    """ Tablero actual como matriz. """
+    D = self.D
+    return [self.board[i*D:(i+1)*D] for i in range(D)]
+
+  def assignment(self) -> [int]:
+    """
+    Asignacion de las N^6 variables de sudoku_to_SAT que corresponde al
+    tablero actual (1 True, -1 False).
+    """
+    return assignment(self.matrix())
+
+def presolve(sudoku: [[int]]) -> ([[int]], str):
+  """
+  Aplica el presolver a una instancia de sudoku.
+  INPUT:
+    - sudoku:   Matriz que representa la instancia de sudoku.
+  OUTPUT:
+    - [[int]]:  Tablero con los digitos deducidos (las eliminaciones de
+                candidatos no se pueden representar en la matriz).
+    - str:      "solved" si quedo resuelto, "conflict" si no tiene solucion,
+                "search" si hace falta buscar.
+  """
+  p = Presolver(sudoku)
+  if p.solve(): return p.matrix(), "solved"
+  return p.matrix(), "conflict" if p.conflict else "search"
+
+
+if __name__ == "__main__":
+    if len(argv) == 2:
+        f = open(argv[1], "r")
+        sudokus = [s.strip() for s in f.readlines() if len(s.strip()) > 2]
+        f.close()
+        for k, s in enumerate(sudokus):
+            sudoku, status = presolve(read_sudoku(s))
+            empty = sum(1 for row in sudoku for x in row if x == 0)
+            print(">>> INSTANCIA [" + str(k+1) + "] " + status + " (" + str(empty) + " casillas vacias)")
+    else:
+        raise Exception("Numero de argumentos invalidos.")
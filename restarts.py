@@ -0,0 +1,87 @@
+#  Politicas de reinicio para laura_SAT.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+# Politicas de reinicio disponibles. None no reinicia.
+RESTARTS = (None, "luby", "geometric")
+
+def luby(i: int) -> int:
+  """
+  Retorna el i-esimo termino (desde 1) de la sucesion de Luby:
+  1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+  INPUT:
+    - i:  Posicion del termino.
+  OUTPUT:
+    - int:  Termino de la sucesion.
+  """
+  # Si i = 2^k - 1 el termino es 2^(k-1); si no, se repite la sucesion desde
+  # el inicio del bloque.
+  k = 1
+  while (1 << k) - 1 < i: k += 1
+  while i != (1 << k) - 1:
+    i -= (1 << (k-1)) - 1
+    k = 1
+    while (1 << k) - 1 < i: k += 1
+  return 1 << (k-1)
+
+class Restarts:
+  """
+  Clase que representara una politica de reinicio: indica cuantos conflictos
+  se permiten antes de cada reinicio. Un reinicio solo deshace las decisiones
+  (regresando por el trail, sin copias del problema); las clausulas aprendidas,
+  los puntajes de la heuristica y los valores guardados de las variables se
+  conservan. Como los limites crecen sin cota, la busqueda sigue siendo completa.
+  """
+  def __init__(self, schedule: str, unit: int = 100, factor: float = 1.5):
+    """
+    Se inicializan los siguientes parametros:
+      self.schedule:  Nombre de la politica (ver RESTARTS).
+      self.unit:      Conflictos del primer reinicio ("luby" los multiplica
+                      por cada termino de la sucesion).
+      self.factor:    Factor de crecimiento de la politica "geometric".
+      self.count:     Numero de reinicios hechos.
+      self.limit:     Conflictos permitidos antes del siguiente reinicio.
+      self.conflicts: Conflictos desde el ultimo reinicio.
+    INPUT:
+      - schedule:   Nombre de la politica.
+      - unit:       Conflictos del primer reinicio.
+      - factor:     Factor de crecimiento de "geometric".
+    """
+    if schedule not in RESTARTS or schedule is None:
+      raise Exception("La politica de reinicio debe ser una de: " + ", ".join(r for r in RESTARTS if r))
+    self.schedule = schedule
+    self.unit = unit
+    self.factor = factor
+    self.count = 0
+    self.conflicts = 0
+    self.limit = self.next_limit()
+
+  def next_limit(self) -> int:
+    """ Conflictos permitidos antes del reinicio numero self.count + 1. """
+    if self.schedule == "luby": return self.unit*luby(self.count + 1)
+    return int(self.unit*self.factor**self.count)
+
+  def conflict(self) -> bool:
+    """
+    Registra un conflicto.
+    OUTPUT:
+      - bool:   Indica si hay que reiniciar. En ese caso se cuenta el reinicio
+                y se calcula el siguiente limite.
+    """
+    self.conflicts += 1
+    if self.conflicts < self.limit: return False
+    self.count += 1
+    self.conflicts = 0
+    self.limit = self.next_limit()
+    return True
+
+def make_restarts(schedule: str) -> Restarts:
+  """
+  Crea la politica de reinicio indicada.
+  INPUT:
+    - schedule:  Nombre de la politica (ver RESTARTS).
+  OUTPUT:
+    - Restarts:  Politica inicializada, None si schedule es None.
+  """
+  return None if schedule is None else Restarts(schedule)
@@ -0,0 +1,155 @@
+#  Pool de procesos persistentes para resolver instancias en paralelo.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+import multiprocessing, os
+from multiprocessing.connection import wait
+from time import perf_counter, process_time
+
+def cpu_time() -> float:
+  """ Tiempo de CPU (usuario y sistema) del proceso actual y de sus hijos ya
+  terminados, en segundos. """
+  t = os.times()
+  return process_time() + t.children_user + t.children_system
+
+def work(conn, target):
+  """
+  Ciclo de un proceso del pool: recibe tareas por conn, ejecuta target con sus
+  argumentos y responde con el resultado, el tiempo que tardo y el tiempo de
+  CPU que consumio. Termina al recibir None.
+  INPUT:
+    - conn:    Extremo del pipe del proceso.
+    - target:  Funcion a ejecutar en cada tarea.
+  """
+  while True:
+    task = conn.recv()
+    if task is None: break
+    i, args = task
+    t, c = perf_counter(), cpu_time()
+    try:
+      result = target(*args)
+      conn.send((i, True, result, perf_counter() - t, cpu_time() - c))
+    except Exception as e:
+      conn.send((i, False, repr(e), perf_counter() - t, cpu_time() - c))
+
+class WorkerPool:
+  """
+  Clase que representara un pool de procesos persistentes, cada uno con su
+  propio pipe. A diferencia de multiprocessing.Pool, cada tarea tiene su
+  propio tiempo maximo: si se alcanza, solo se termina el proceso que la
+  ejecuta y se reemplaza por uno nuevo.
+  """
+  def __init__(self, target, workers: int = None):
+    """
+    Se inicializan los siguientes parametros:
+      self.target:   Funcion que ejecutan los procesos.
+      self.procs:    Proceso y extremo del pipe de cada trabajador.
+    INPUT:
+      - target:   Funcion que ejecutan los procesos (debe estar definida a nivel
+                  de modulo).
+      - workers:  Numero de procesos. Por defecto, el numero de nucleos.
+    """
+    self.target = target
+    self.procs = [self.spawn() for _ in range(workers or os.cpu_count() or 1)]
+
+  def spawn(self) -> [multiprocessing.Process, object]:
+    """ Crea un proceso trabajador y retorna el proceso y su extremo del pipe. """
+    parent, child = multiprocessing.Pipe()
+    p = multiprocessing.Process(target=work, args=(child, self.target), daemon=True)
+    p.start()
+    child.close()
+    return [p, parent]
+
+  def restart(self, slot: int):
+    """ Termina el proceso del puesto slot y lo reemplaza por uno nuevo. """
+    p, conn = self.procs[slot]
+    p.terminate()
+    p.join()
+    conn.close()
+    self.procs[slot] = self.spawn()
+
+  def map(self, tasks, t_max: float):
+    """
+    Generador que reparte las tareas entre los procesos y retorna sus
+    resultados en el mismo orden de las tareas, apenas estan disponibles. Las
+    tareas se consumen a medida que hay procesos libres.
+    INPUT:
+      - tasks:  Iterable con las tuplas de argumentos de cada tarea.
+      - t_max:  Tiempo maximo de cada tarea.
+    OUTPUT:
+      - (object, float, float, str):  Resultado de la tarea (None si alcanzo el
+                                       tiempo maximo o fallo), el tiempo que
+                                       tardo, el tiempo de CPU que consumio (0
+                                       si alcanzo el tiempo maximo) y el error
+                                       de la tarea (None si no fallo). Si una
+                                       tarea falla las demas continuan.
+    """
+    tasks = enumerate(tasks)
+    idle = list(range(len(self.procs)))[::-1]
+    busy = {}
+    results = {}
+    pending = True
+    next_out = 0
+    while True:
+      # Asignamos tareas a los procesos libres.
+      while idle and pending:
+        task = next(tasks, None)
+        if task is None:
+          pending = False
+          break
+        slot = idle.pop()
+        self.procs[slot][1].send(task)
+        busy[slot] = (task[0], perf_counter() + t_max)
+      if not busy: break
+
+      # Esperamos (sin consumir CPU) a que termine alguna tarea o venza el
+      # primer tiempo maximo.
+      conns = {self.procs[slot][1]: slot for slot in busy}
+      timeout = max(0, min(d for _, d in busy.values()) - perf_counter())
+      for conn in wait(list(conns), timeout):
+        slot = conns[conn]
+        i, deadline = busy.pop(slot)
+        try:
+          _, ok, result, t, c = conn.recv()
+        except EOFError:
+          # El proceso murio sin responder.
+          self.restart(slot)
+          ok, result, t, c = False, "El proceso termino inesperadamente.", 0, 0
+        # Una respuesta que llega despues del tiempo maximo no cuenta.
+        if perf_counter() > deadline: results[i] = (None, t_max, 0, None)
+        elif ok: results[i] = (result, t, c, None)
+        else: results[i] = (None, t, c, result)
+        idle.append(slot)
+
+      # Cancelamos las tareas que alcanzaron su tiempo maximo.
+      now = perf_counter()
+      for slot, (i, deadline) in list(busy.items()):
+        if now >= deadline:
+          del busy[slot]
+          self.restart(slot)
+          results[i] = (None, t_max, 0, None)
+          idle.append(slot)
+
+      while next_out in results:
+        yield results.pop(next_out)
+        next_out += 1
+    while next_out in results:
+      yield results.pop(next_out)
+      next_out += 1
+
+  def close(self):
+    """ Termina todos los procesos del pool. """
+    for p, conn in self.procs:
+      try: conn.send(None)
+      except (BrokenPipeError, OSError): pass
+    for p, conn in self.procs:
+      p.join(1)
+      if p.is_alive(): p.terminate()
+      conn.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
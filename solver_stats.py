@@ -0,0 +1,99 @@
+#  Estadisticas de la busqueda de laura_SAT.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+from sys import getsizeof
+
+class SolverStats:
+  """
+  Clase que representara los contadores de una busqueda de laura_SAT. Los
+  nucleos solo los actualizan si reciben una instancia de esta clase: sin ella
+  la propagacion es exactamente la misma, y el resto de la busqueda solo
+  verifica que no la tiene en cada decision y conflicto.
+  """
+  # Contadores que solo lleva algun nucleo; se omiten si quedan en 0.
+  OPTIONAL = ("touched", "learnts", "deleted", "restarts")
+
+  def __init__(self, progress = None, every: int = 10000):
+    """
+    Se inicializan los siguientes parametros:
+      self.decisions:     Numero de decisiones.
+      self.propagations:  Numero de literales propagados (iteraciones de
+                          verify_units en el nucleo dpll).
+      self.conflicts:     Numero de conflictos.
+      self.backtracks:    Numero de regresos a un nivel anterior.
+      self.max_depth:     Mayor nivel de decision alcanzado.
+      self.touched:       Clausulas que recorre update_C (solo el nucleo dpll).
+      self.learnts:       Clausulas aprendidas (solo el nucleo cdcl).
+      self.deleted:       Clausulas aprendidas eliminadas al reducirlas (solo
+                          el nucleo cdcl).
+      self.restarts:      Numero de reinicios.
+      self.trail_bytes:   Mayor tamano en bytes del trail, donde se guardan
+                          los cambios que se deshacen al regresar.
+      self.progress:      Funcion que se llama con las estadisticas cada
+                          every decisiones, None para no llamarla.
+      self.every:         Numero de decisiones entre llamadas a progress.
+    INPUT:
+      - progress:   Funcion de progreso.
+      - every:      Numero de decisiones entre llamadas a progress.
+    """
+    self.decisions = 0
+    self.propagations = 0
+    self.conflicts = 0
+    self.backtracks = 0
+    self.max_depth = 0
+    self.touched = 0
+    self.learnts = 0
+    self.deleted = 0
+    self.restarts = 0
+    self.trail_bytes = 0
+    self.progress = progress
+    self.every = every
+
+  def decision(self, depth: int, trail: list):
+    """
+    Registra una decision y llama a progress si corresponde.
+    INPUT:
+      - depth:  Nivel de decision que se abre.
+      - trail:  Trail del nucleo.
+    """
+    self.decisions += 1
+    if depth > self.max_depth: self.max_depth = depth
+    self.measure(trail)
+    if self.progress is not None and self.decisions % self.every == 0: self.progress(self)
+
+  def conflict(self, trail: list):
+    """
+    Registra un conflicto.
+    INPUT:
+      - trail:  Trail del nucleo, que en un conflicto suele estar en su mayor tamano.
+    """
+    self.conflicts += 1
+    self.measure(trail)
+
+  def measure(self, trail: list):
+    """
+    Actualiza el mayor tamano del trail.
+    INPUT:
+      - trail:  Trail del nucleo.
+    """
+    size = getsizeof(trail)
+    if size > self.trail_bytes: self.trail_bytes = size
+
+  def as_dict(self) -> {str: int}:
+    """ Retorna los contadores, sin los opcionales que quedaron en 0. """
+    counters = {"decisions": self.decisions, "propagations": self.propagations,
+                "conflicts": self.conflicts, "backtracks": self.backtracks,
+                "max_depth": self.max_depth, "touched": self.touched,
+                "learnts": self.learnts, "deleted": self.deleted, "restarts": self.restarts,
+                "trail_bytes": self.trail_bytes}
+    return {k: x for k, x in counters.items() if x or k not in self.OPTIONAL}
+
+  def line(self) -> str:
+    """ Retorna los contadores en una sola linea. """
+    return ", ".join(k + ": " + str(x) for k, x in self.as_dict().items())
+
+  def lines(self) -> str:
+    """ Retorna los contadores como lineas de comentario 'c' del formato cnf. """
+    return "\n".join("c " + k + ": " + str(x) for k, x in self.as_dict().items())
@@ -0,0 +1,232 @@
+#  Cache persistente de soluciones de sudoku, por forma canonica.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+import sqlite3
+from itertools import permutations, product
+from sys import argv
+from sudoku_to_SAT import read_sudoku
+from SAT_to_sudoku import matrix_to_sudoku
+
+# Numero maximo de ordenes de filas (o de columnas) que se prueban al desempatar.
+MAX_ORDERS = 64
+
+def signatures(sudoku: [[int]], N: int) -> [tuple]:
+  """
+  Firma de cada fila, invariante bajo el reetiquetado de digitos y las
+  permutaciones de columnas dentro de cada grupo de N columnas: el numero de
+  casillas dadas de la fila en cada grupo, y el numero de casillas dadas de
+  las columnas donde tiene casillas dadas.
+  INPUT:
+    - sudoku:   Matriz del sudoku.
+    - N:        Grado del tablero.
+  OUTPUT:
+    - [tuple]:  Firma de cada fila.
+  """
+  D = N*N
+  col_count = [sum(1 for i in range(D) if sudoku[i][j]) for j in range(D)]
+  return [(tuple(sum(1 for j in range(s*N, (s+1)*N) if row[j]) for s in range(N)),
+           tuple(sorted(col_count[j] for j in range(D) if row[j])))
+          for row in sudoku]
+
+def orders(sig: [tuple], N: int) -> [[int]]:
+  """
+  Ordenes candidatos de las filas: dentro de cada banda las filas se ordenan
+  por firma (de mayor a menor) y los empates se prueban en todos sus ordenes.
+  Si hay mas de MAX_ORDERS ordenes, solo se usa el que deja los empates en
+  orden original (la clave sigue siendo correcta, pero puede no coincidir con
+  la de otra variante de la misma instancia).
+  INPUT:
+    - sig:  Firma de cada fila.
+    - N:    Grado del tablero.
+  OUTPUT:
+    - [[int]]:  Ordenes de las filas (fila original de cada posicion).
+  """
+  choices = []
+  total = 1
+  for band in range(N):
+    rows = sorted(range(band*N, (band+1)*N), key=lambda i: sig[i], reverse=True)
+    # Agrupamos las filas con la misma firma.
+    groups = []
+    for i in rows:
+      if groups and sig[groups[-1][0]] == sig[i]: groups[-1].append(i)
+      else: groups.append([i])
+    for g in groups:
+      choices.append(list(permutations(g)))
+      total *= len(choices[-1])
+  if total > MAX_ORDERS: choices = [c[:1] for c in choices]
+  return [[i for g in combo for i in g] for combo in product(*choices)]
+
+def relabel(sudoku: [[int]], labels: {int: int}) -> [[int]]:
+  """
+  Reetiqueta los digitos de un tablero, extendiendo labels con los digitos
+  nuevos en orden de primera aparicion (por filas).
+  INPUT:
+    - sudoku:   Matriz del tablero.
+    - labels:   Digito nuevo de cada digito original. Se modifica.
+  OUTPUT:
+    - [[int]]:  Tablero reetiquetado.
+  """
+  result = []
+  for row in sudoku:
+    new_row = []
+    for d in row:
+      if d and d not in labels: labels[d] = len(labels) + 1
+      new_row.append(labels[d] if d else 0)
+    result.append(new_row)
+  return result
+
+def transform(sudoku: [[int]], t: tuple) -> [[int]]:
+  """
+  Aplica la transformacion t = (transpuesta, filas, columnas) a un tablero.
+  """
+  transposed, rows, cols = t
+  if transposed: sudoku = [list(col) for col in zip(*sudoku)]
+  return [[sudoku[i][j] for j in cols] for i in rows]
+
+def inverse(sudoku: [[int]], t: tuple) -> [[int]]:
+  """
+  Deshace la transformacion t = (transpuesta, filas, columnas) de un tablero.
+  """
+  transposed, rows, cols = t
+  D = len(sudoku)
+  result = [[0]*D for _ in range(D)]
+  for a, i in enumerate(rows):
+    for b, j in enumerate(cols):
+      result[i][j] = sudoku[a][b]
+  if transposed: result = [list(col) for col in zip(*result)]
+  return result
+
+def canonical(sudoku: [[int]]) -> (str, tuple, {int: int}):
+  """
+  Forma canonica de una instancia de sudoku, invariante bajo el reetiquetado
+  de digitos, las permutaciones de filas dentro de cada banda, las de columnas
+  dentro de cada grupo de columnas, y la transposicion. Se refinan los ordenes
+  con las firmas de filas y columnas, se prueban los empates (hasta
+  MAX_ORDERS ordenes por eje) y se toma el menor tablero reetiquetado.
+  INPUT:
+    - sudoku:   Matriz del sudoku.
+  OUTPUT:
+    - str:    Clave: el tablero canonico en el formato de read_sudoku.
+    - tuple:  Transformacion (transpuesta, filas, columnas) que lleva el
+              tablero a la forma canonica.
+    - {int: int}:   Digito canonico de cada digito del tablero.
+  """
+  D = len(sudoku)
+  N = int(round(D**(1/2)))
+  best = None
+  for transposed in (False, True):
+    m = [list(col) for col in zip(*sudoku)] if transposed else sudoku
+    row_orders = orders(signatures(m, N), N)
+    col_orders = orders(signatures([list(col) for col in zip(*m)], N), N)
+    for rows in row_orders:
+      for cols in col_orders:
+        labels = {}
+        flat = tuple(d for row in relabel([[m[i][j] for j in cols] for i in rows], labels) for d in row)
+        if best is None or flat < best[0]:
+          best = (flat, (transposed, rows, cols), labels)
+  flat, t, labels = best
+  key = matrix_to_sudoku([list(flat[i*D:(i+1)*D]) for i in range(D)])[0]
+  return key, t, labels
+
+class SudokuCache:
+  """
+  Clase que representara una cache de soluciones en SQLite. Cada instancia se
+  guarda por su forma canonica, con la solucion canonica y el tiempo que tardo
+  en resolverse, de modo que las variantes simetricas de una instancia ya
+  resuelta tambien son aciertos. Cuando hay mas de max_entries soluciones se
+  eliminan las usadas hace mas tiempo.
+  """
+  def __init__(self, path: str, max_entries: int = 10000):
+    """
+    Se inicializan los siguientes parametros:
+      self.db:          Conexion a la base de datos.
+      self.max_entries: Numero maximo de soluciones guardadas.
+      self.hits:        Aciertos en esta ejecucion.
+      self.misses:      Fallos en esta ejecucion.
+      self.clock:       Contador para ordenar los usos de las soluciones.
+    INPUT:
+      - path:         Archivo de la base de datos.
+      - max_entries:  Numero maximo de soluciones guardadas.
+    """
+    self.db = sqlite3.connect(path)
+    self.db.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, "
+                    "solution TEXT, time REAL, used INTEGER)")
+    self.db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+    self.max_entries = max_entries
+    self.hits = self.misses = 0
+    self.clock = self.db.execute("SELECT COALESCE(MAX(used), 0) FROM solutions").fetchone()[0]
+
+  def count(self, name: str):
+    """ Incrementa el contador persistente name. """
+    self.db.execute("INSERT OR IGNORE INTO counters VALUES (?, 0)", (name,))
+    self.db.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+
+  def get(self, sudoku: [[int]]) -> ([[int]], float):
+    """
+    Busca la solucion de una instancia.
+    INPUT:
+      - sudoku:   Matriz del sudoku.
+    OUTPUT:
+      - [[int]]:  Matriz de la solucion, None si no esta en la cache.
+      - float:    Tiempo que tardo en resolverse originalmente.
+    """
+    key, t, labels = canonical(sudoku)
+    row = self.db.execute("SELECT solution, time FROM solutions WHERE key = ?", (key,)).fetchone()
+    if row is None:
+      self.misses += 1
+      self.count("misses")
+      self.db.commit()
+      return None, 0
+    self.hits += 1
+    self.count("hits")
+    self.clock += 1
+    self.db.execute("UPDATE solutions SET used = ? WHERE key = ?", (self.clock, key))
+    self.db.commit()
+
+    # Los digitos que no aparecen en la instancia se pueden intercambiar entre
+    # si, asi que se completan las etiquetas en cualquier orden.
+    D = len(sudoku)
+    back = {c: d for d, c in labels.items()}
+    free = [d for d in range(1, D+1) if d not in labels]
+    for c in range(1, D+1):
+      if c not in back: back[c] = free.pop(0)
+    solution = read_sudoku(row[0])
+    return inverse([[back[c] for c in r] for r in solution], t), row[1]
+
+  def put(self, sudoku: [[int]], solution: str, time: float):
+    """
+    Guarda la solucion de una instancia.
+    INPUT:
+      - sudoku:     Matriz del sudoku.
+      - solution:   Solucion en el formato de SAT_to_sudoku.
+      - time:       Tiempo que tardo en resolverse.
+    """
+    key, t, labels = canonical(sudoku)
+    canon = relabel(transform(read_sudoku(solution), t), labels)
+    self.clock += 1
+    self.db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+                    (key, matrix_to_sudoku(canon)[0], time, self.clock))
+    # Eliminamos las soluciones usadas hace mas tiempo.
+    self.db.execute("DELETE FROM solutions WHERE key IN (SELECT key FROM solutions "
+                    "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+    self.db.commit()
+
+  def stats(self) -> {str: int}:
+    """ Aciertos y fallos acumulados, y numero de soluciones guardadas. """
+    result = dict(self.db.execute("SELECT name, value FROM counters").fetchall())
+    result["entries"] = self.db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+    return result
+
+  def close(self):
+    self.db.close()
+
+
+if __name__ == "__main__":
+    if len(argv) == 2:
+        cache = SudokuCache(argv[1])
+        print(cache.stats())
+        cache.close()
+    else:
+        raise Exception("Numero de argumentos invalidos.")
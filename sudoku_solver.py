@@ -3,53 +3,58 @@
 #       - David Segura
 #       - Amin Arriaga
 
-import multiprocessing, queue, os, subprocess, re
-import matplotlib.pyplot as plt
+import multiprocessing, os, subprocess, tempfile, signal
+from multiprocessing.connection import wait
 from sys import argv
-from time import time, sleep
-from sudoku_to_SAT import sudoku_to_SAT, read_sudoku
-from laura_SAT import laura_SAT, read_SAT
-from SAT_to_sudoku import SAT_to_sudoku
+from time import perf_counter
+from sudoku_to_SAT import sudoku_to_SAT, read_sudoku, sudoku_closures, Reduction, assignment, tables
+from laura_SAT import laura_SAT, laura_SAT_models, read_SAT, build_SAT, get_option, pack_solution, unpack_solution
+from SAT_to_sudoku import SAT_to_sudoku, matrix_to_sudoku
+from sudoku_cache import SudokuCache
+from presolve import Presolver
+from exact_cover import ExactCover
+from watched_SAT import Watched
+from preprocess import preprocess_SAT
+from solver_stats import SolverStats
+from solver_pool import WorkerPool, cpu_time
 
-def timer(f, t_max: float, *args) -> float:
+def run_timed(conn, f, args):
+    """ Ejecuta f en el proceso creado por timer y envia por conn su resultado,
+    el tiempo que tardo y el tiempo de CPU que consumio. """
+    t, c = perf_counter(), cpu_time()
+    result = f(*args)
+    conn.send((result, perf_counter() - t, cpu_time() - c))
+
+def timer(f, t_max: float, *args) -> (float, float, object):
     """ 
-    Ejecuta una funcion, cancelando el proceso si se alcanza un tiempo maximo. 
+    Ejecuta una funcion en otro proceso, cancelandolo si se alcanza un tiempo
+    maximo. La espera se hace bloqueada sobre un pipe, sin consumir CPU.
     INPUT:
-        - f: function   Funcion a ejecutar.
+        - f: function   Funcion a ejecutar (definida a nivel de modulo).
         - t_max:    Tiempo maximo.
         - *args:    Argumentos de la funcion.
     OUTPUT:
         - float:    Tiempo que tardo en ejecutarse la funcion. 0 en caso de
                     que alcance el tiempo maximo.
+        - float:    Tiempo de CPU que consumio la funcion. 0 en caso de que
+                    alcance el tiempo maximo.
+        - object:   Resultado de la funcion. None en caso de que alcance el
+                    tiempo maximo.
     """
+    receiver, sender = multiprocessing.Pipe(False)
+    h = multiprocessing.Process(target=run_timed, args=(sender, f, args))
+    h.start()
+    sender.close()
 
-    def wait(t_max = t_max):
-        """ Funcion que finaliza al pasar un tiempo maximo. """
-        initial_t = time()
-        while time() - initial_t < t_max:
-            pass
-        # El return es necesario para el metodo put de multiprocessing.Queue().
-        return
-    
-    # Creamos los hilos de ambas funciones.
-    h1 = multiprocessing.Process(target=f, args=args)
-    h2 = multiprocessing.Process(target=wait)
-
-    t = time()
-    h1.start()
-    h2.start()
-    while h2.is_alive() and h1.is_alive():
-        pass
-    t = time() - t
-
-    # Verificamos cual se ejecuto primero y cancelamos el otro.
-    if h1.is_alive(): h1.terminate(); return 0
-    else: h2.terminate(); return t
-
-def get_solution(V: [int], C: [[int]], result: multiprocessing.Queue):
-    """ Funcion que ejecuta laura_SAT y guarda se resultado en una cola
-    de multiprocessing. """
-    result.put(laura_SAT(V, C))
+    # poll bloquea hasta que llega el resultado o se alcanza el tiempo maximo.
+    if receiver.poll(t_max):
+        try: result, t, c = receiver.recv()
+        except EOFError: raise Exception("El proceso termino sin retornar un resultado.")
+        finally: h.join()
+        return t, c, result
+    h.terminate()
+    h.join()
+    return 0, 0, None
 
 def print_sudoku(sudoku) -> str:
     """ 
@@ -85,44 +90,532 @@ def print_sudoku(sudoku) -> str:
             final += bar + "\n"
     return final
 
-def sudoku_solver(sat: str, t_max: float) -> (float, str,[[int]]):
+# Motores de resolucion: el pipeline SAT (laura_SAT) o cobertura exacta.
+ENGINES = ("sat", "exact")
+
+def build_instance(sat, core: str = "dpll", reduced: bool = False):
+    """
+    Construye las estructuras de laura_SAT de una instancia de sudoku.
+    INPUT:
+        - sat:      String en CNF o matriz del sudoku (ver sudoku_solver).
+        - core:     Nucleo de busqueda de laura_SAT.
+        - reduced:  Indica si se usa la version simplificada (Reduction).
+    OUTPUT:
+        - (V, C, Reduction):  Variables, clausulas y la reduccion usada (None
+                              si no se uso).
+    """
+    reduction = None
+    if isinstance(sat, str): V, C = read_SAT(sat, core != "dpll")
+    elif reduced:
+        reduction = Reduction(sat)
+        V, C = build_SAT(reduction.n, reduction.closures(), core != "dpll")
+    else: V, C = build_SAT(len(sat)**3, sudoku_closures(sat), core != "dpll")
+    return V, C, reduction
+
+class IncrementalSudoku:
+    """
+    Clase que representara un resolvedor incremental para sudokus de un mismo
+    tamano: las clausulas de las reglas (las del tablero vacio) se cargan una
+    sola vez en un resolvedor Watched, y cada instancia se resuelve pasando sus
+    casillas dadas como suposiciones. Como las clausulas aprendidas solo
+    dependen de las reglas, se conservan de una instancia a otra; para que no
+    crezcan sin limite, Watched.reduce elimina periodicamente las de mayor LBD
+    sin tocar las de las reglas.
+    """
+    def __init__(self, D: int, core: str = "cdcl", heuristic: str = "order",
+                 polarity: str = None, seed: int = None, restarts: str = None):
+        """
+        Se inicializan los siguientes parametros:
+            self.D:       Lado del tablero.
+            self.base:    Base de cada casilla en la representacion en SAT.
+            self.mode:    Modo de Watched ("cdcl" con el nucleo cdcl, "dpll"
+                          con los demas).
+            self.solver:  Resolvedor con las clausulas de las reglas.
+        INPUT:
+            - D:          Lado del tablero.
+            - core:       Nucleo de busqueda de laura_SAT.
+            - heuristic:  Heuristica de decision.
+            - polarity:   Polaridad de las decisiones.
+            - seed:       Semilla para desempatar las decisiones.
+            - restarts:   Politica de reinicio de cada busqueda (ver
+                          restarts.py). Con reinicios la polaridad por
+                          defecto es "saved", como en laura_SAT.
+        """
+        self.D = D
+        self.base, _ = tables(int(round(D**(1/2))))
+        self.mode = "cdcl" if core == "cdcl" else "dpll"
+        if restarts is not None and polarity is None: polarity = "saved"
+        self.solver = Watched(D**3, sudoku_closures([[0]*D for _ in range(D)]), heuristic,
+                              polarity, seed, None, restarts)
+
+    def solve(self, sudoku: [[int]], stats: SolverStats = None) -> [int]:
+        """
+        Resuelve una instancia suponiendo sus casillas dadas.
+        INPUT:
+            - sudoku:   Matriz del sudoku, de lado self.D.
+            - stats:    Estadisticas donde se cuenta solo esta busqueda, None
+                        para no recolectarlas.
+        OUTPUT:
+            - [int]:    Asignacion de las N^6 variables (0 en todas si no tiene
+                        solucion, como en laura_SAT).
+        """
+        if len(sudoku) != self.D:
+            raise Exception("El sudoku debe tener lado " + str(self.D) + ".")
+        base = self.base
+        assumptions = [base[i][j] + d for i, row in enumerate(sudoku) for j, d in enumerate(row) if d]
+        self.solver.stats = stats
+        try: V, conflict = self.solver.solve(self.mode, assumptions)
+        finally: self.solver.stats = None
+        return V
+
+# Resolvedores incrementales del proceso actual, por tamano y configuracion.
+# Cada proceso del pool de sudoku_solver_batch conserva los suyos entre tareas.
+SESSIONS = {}
+
+def incremental_session(D: int, core: str, heuristic: str, polarity: str,
+                        seed: int, restarts: str = None) -> IncrementalSudoku:
+    """ Retorna el resolvedor incremental del proceso actual para la
+    configuracion dada, creandolo la primera vez. """
+    key = (D, core, heuristic, polarity, seed, restarts)
+    if key not in SESSIONS: SESSIONS[key] = IncrementalSudoku(*key)
+    return SESSIONS[key]
+
+def solve_formula(sat, core: str = "dpll", heuristic: str = "order", reduced: bool = False,
+                  polarity: str = None, seed: int = None, presolve: bool = False,
+                  engine: str = "sat", incremental: bool = False,
+                  solutions: int = 1, preprocess: bool = False,
+                  stats: bool = False, restarts: str = None) -> (bytes, int, str, int, dict):
+    """
+    Construye y resuelve una instancia de sudoku dentro del proceso que la
+    resuelve, de modo que al proceso solo se envia la instancia (el texto en CNF
+    o la matriz) y solo se recibe la asignacion empaquetada. Con presolve, si
+    sat es la matriz, primero se aplica el presolver (presolve.py) y solo se
+    codifica en SAT el tablero reducido cuando hace falta buscar. Con el motor
+    "exact" el tablero se resuelve por cobertura exacta (exact_cover.py) en
+    lugar de SAT. Con incremental, si sat es la matriz, se usa el resolvedor
+    incremental del proceso para su tamano (ver IncrementalSudoku), y no se
+    usa la version simplificada. Con solutions mayor a 1 se enumeran hasta
+    ese numero de soluciones (ver laura_SAT_models), distinguiendolas solo por
+    las variables de casilla y digito; asi, con solutions = 2 se verifica si la
+    solucion es unica. Los tableros que resuelve el presolver tienen solucion
+    unica, pues sus deducciones son validas en cualquier solucion. Con
+    preprocess, la formula pasa por preprocess.py antes de laura_SAT (sin
+    eliminar variables si se enumeran soluciones). Con stats se cuentan las
+    decisiones, propagaciones, conflictos, etc. de laura_SAT (ver
+    solver_stats.py). Con restarts, laura_SAT reinicia la busqueda segun esa
+    politica (ver restarts.py).
+    INPUT:
+        - sat:        String en CNF o matriz del sudoku (ver sudoku_solver).
+        - core:       Nucleo de busqueda de laura_SAT.
+        - heuristic:  Heuristica de decision de laura_SAT.
+        - reduced:    Indica si se usa la version simplificada (Reduction).
+        - polarity:   Polaridad de las decisiones de laura_SAT.
+        - seed:       Semilla para desempatar las decisiones de laura_SAT.
+        - presolve:   Indica si se aplica el presolver antes de SAT.
+        - engine:     Motor de resolucion (ver ENGINES).
+        - incremental: Indica si se usa el resolvedor incremental. No aplica al
+                      enumerar soluciones.
+        - solutions:  Numero maximo de soluciones a enumerar.
+        - preprocess: Indica si se preprocesa la formula.
+        - stats:      Indica si se recolectan estadisticas de laura_SAT.
+        - restarts:   Politica de reinicio de laura_SAT, None para no reiniciar.
+    OUTPUT:
+        - bytes:  Asignacion de las N^6 variables, empaquetada con pack_solution.
+        - int:    Numero de variables.
+        - str:    Etapa que resolvio la instancia ("presolve", "SAT" o "exact").
+        - int:    Numero de soluciones encontradas (a lo sumo solutions), None
+                  si solutions es 1.
+        - dict:   Estadisticas de laura_SAT (ver SolverStats.as_dict), None si
+                  no se recolectan o la instancia no llego a laura_SAT.
+    """
+    if engine not in ENGINES:
+        raise Exception("El motor debe ser uno de: " + ", ".join(ENGINES))
+    if engine == "exact" and isinstance(sat, str):
+        raise Exception("El motor exact necesita la matriz del sudoku, no el texto en CNF.")
+    if solutions < 1: raise Exception("El numero de soluciones debe ser positivo.")
+    count = solutions if solutions > 1 else None
+    if count and engine == "exact":
+        raise Exception("Las soluciones solo se pueden enumerar con el motor sat.")
+    if presolve and not isinstance(sat, str):
+        p = Presolver(sat)
+        if p.solve(): return pack_solution(p.assignment()), len(sat)**3, "presolve", count and 1, None
+        # Sin solucion: la misma asignacion vacia que retorna laura_SAT.
+        if p.conflict: return pack_solution([0]*len(sat)**3), len(sat)**3, "presolve", count and 0, None
+        sat = p.matrix()
+    if engine == "exact":
+        solver = ExactCover(sat)
+        V_sol = assignment(solver.matrix()) if solver.solve() else [0]*len(sat)**3
+        return pack_solution(V_sol), len(V_sol), "exact", None, None
+    stats = SolverStats() if stats else None
+    if incremental and not count and not isinstance(sat, str):
+        V_sol = incremental_session(len(sat), core, heuristic, polarity, seed, restarts).solve(sat, stats)
+        return pack_solution(V_sol), len(V_sol), "SAT", None, stats and stats.as_dict()
+    V, C, reduction = build_instance(sat, core, reduced)
+    # Sin solucion se retorna la asignacion vacia de las variables originales.
+    n = V if isinstance(V, int) else len(V)
+    if preprocess: V, C, p = preprocess_SAT(V, C, core != "dpll", not count)
+    if count:
+        # Todas las variables de la codificacion son de casilla y digito (con
+        # Reduction, las de los candidatos vivos; con preprocess, las que
+        # siguen apareciendo en la formula).
+        cells = reduction is None and not preprocess and not isinstance(sat, str)
+        project = range(1, len(sat)**3 + 1) if cells else None
+        models = laura_SAT_models(V, C, solutions, core, heuristic, polarity, seed, project, stats,
+                                  restarts)
+        count = len(models)
+        V_sol = models[0] if models else None
+    else:
+        V_sol, conflict = laura_SAT(V, C, core, heuristic, polarity, seed, stats, restarts)
+        if conflict: V_sol = None
+    if V_sol is None: V_sol = [0]*n
+    elif preprocess: V_sol = p.extend(V_sol)
+    if reduction is not None: V_sol = reduction.expand(V_sol)
+    return pack_solution(V_sol), len(V_sol), "SAT", count, stats and stats.as_dict()
+
+def solve_instance(sudoku: str, core: str = "dpll", heuristic: str = "order",
+                   reduced: bool = False, polarity: str = None, seed: int = None,
+                   presolve: bool = False, engine: str = "sat",
+                   incremental: bool = False, solutions: int = 1,
+                   preprocess: bool = False, stats: bool = False,
+                   restarts: str = None) -> (bytes, int, str, int, dict):
+    """
+    Resuelve una instancia de sudoku dentro de un proceso del pool de
+    sudoku_solver_batch o de sudoku_race, sin tiempo maximo (lo controla quien
+    creo el proceso). Los argumentos son los de solve_formula, pero la
+    instancia viene como el string del sudoku.
+    OUTPUT:
+        - (bytes, int, str, int, dict):  Lo mismo que solve_formula.
+    """
+    return solve_formula(read_sudoku(sudoku), core, heuristic, reduced, polarity, seed, presolve,
+                         engine, incremental, solutions, preprocess, stats, restarts)
+
+def decode(result: (bytes, int, str, int, dict)) -> (str, [[int]]):
+    """ Traduce la asignacion empaquetada que retorna solve_formula a la
+    solucion del sudoku (ver SAT_to_sudoku). """
+    return SAT_to_sudoku(unpack_solution(result[0], result[1]))
+
+def report(result: (bytes, int, str, int, dict), t: float,
+           c: float) -> (float, str, [[int]], float, str, int, dict):
+    """ Arma el resultado de sudoku_solver a partir del que retorna
+    solve_formula, su tiempo y su tiempo de CPU. """
+    string_solution, m = decode(result)
+    string_solution += " Time: " + str(t)
+    if result[3] is not None: string_solution += " Solutions: " + str(result[3])
+    return (t, string_solution, m, c, result[2], result[3], result[4])
+
+# Resultado de una instancia que alcanzo el tiempo maximo.
+EXPIRED = (0, "Time expired.", [[0]], 0, None, None, None)
+
+def failed(error: str) -> (float, str, [[int]], float, str, int, dict):
+    """ Resultado de una instancia cuyo proceso fallo, con el mensaje de error. """
+    return (0, "Error: " + error, [[0]], 0, None, None, None)
+
+def sudoku_solver_batch(sudokus: [str], t_max: float, core: str = "dpll",
+                        heuristic: str = "order", reduced: bool = False,
+                        workers: int = None, polarity: str = None, seed: int = None,
+                        presolve: bool = False, engine: str = "sat",
+                        incremental: bool = False, solutions: int = 1,
+                        preprocess: bool = False, stats: bool = False,
+                        restarts: str = None):
+    """
+    Generador que resuelve varias instancias de sudoku repartiendolas entre un
+    pool de procesos persistentes (ver solver_pool.py), cada una con su propio
+    tiempo maximo. Los resultados se retornan en el orden de las instancias.
+    Con incremental, cada proceso resuelve todas sus instancias de un mismo
+    tamano con un solo resolvedor incremental (ver IncrementalSudoku).
+    INPUT:
+        - sudokus:    Strings de las instancias de sudoku.
+        - t_max:      Tiempo maximo para la resolucion de cada sudoku.
+        - core:       Nucleo de busqueda de laura_SAT.
+        - heuristic:  Heuristica de decision de laura_SAT.
+        - reduced:    Indica si se usa la version simplificada (Reduction).
+        - workers:    Numero de procesos. Por defecto, el numero de nucleos.
+        - polarity:   Polaridad de las decisiones de laura_SAT.
+        - seed:       Semilla para desempatar las decisiones de laura_SAT.
+        - presolve:   Indica si se aplica el presolver antes de SAT.
+        - engine:     Motor de resolucion (ver ENGINES).
+        - incremental: Indica si se usa el resolvedor incremental.
+        - solutions:  Numero maximo de soluciones a enumerar por instancia.
+        - preprocess: Indica si se preprocesa la formula (ver preprocess.py).
+        - stats:      Indica si se recolectan estadisticas de laura_SAT.
+        - restarts:   Politica de reinicio de laura_SAT.
+    OUTPUT:
+        - (float, str, [[int]], float, str, int, dict):  Lo mismo que
+                                              sudoku_solver para cada instancia.
+    """
+    tasks = ((s, core, heuristic, reduced, polarity, seed, presolve, engine, incremental, solutions,
+              preprocess, stats, restarts) for s in sudokus)
+    with WorkerPool(solve_instance, workers) as pool:
+        for result, t, c, error in pool.map(tasks, t_max):
+            if error is not None: yield failed(error)
+            else: yield EXPIRED if result is None else report(result, t, c)
+
+def cached(sudokus: [str], cache: SudokuCache, solve):
+    """
+    Generador que retorna los resultados de varias instancias de sudoku en
+    orden, tomando de la cache las que ya estan (sin codificarlas ni
+    resolverlas) y resolviendo las demas con solve. Las soluciones nuevas se
+    guardan en la cache.
+    INPUT:
+        - sudokus:  Strings de las instancias de sudoku.
+        - cache:    Cache de soluciones.
+        - solve:    Funcion que recibe la lista de instancias que no estan en
+                    la cache y retorna un iterable con sus resultados (como
+                    sudoku_solver_batch).
+    OUTPUT:
+        - (float, str, [[int]], float, str, int, dict):  Lo mismo que
+                                                   sudoku_solver, con la etapa
+                                                   "cache" para los aciertos.
+    """
+    found = []
+    for s in sudokus:
+        t, c = perf_counter(), cpu_time()
+        m, _ = cache.get(read_sudoku(s))
+        if m is None: found.append(None)
+        else:
+            string_solution, m = matrix_to_sudoku(m)
+            t = perf_counter() - t
+            found.append((t, string_solution + " Time: " + str(t), m, cpu_time() - c, "cache", None, None))
+    results = iter(solve([s for s, r in zip(sudokus, found) if r is None]))
+    for s, r in zip(sudokus, found):
+        if r is None:
+            r = next(results)
+            string_solution = r[1].split(" Time: ")[0]
+            # Solo se guardan las soluciones completas.
+            if r[0] and "0" not in string_solution.split()[1]:
+                cache.put(read_sudoku(s), string_solution, r[0])
+        yield r
+
+def sudoku_solver(sat: str, t_max: float, core: str = "dpll",
+                  heuristic: str = "order", reduced: bool = False, polarity: str = None,
+                  seed: int = None, presolve: bool = False,
+                  engine: str = "sat", solutions: int = 1,
+                  preprocess: bool = False, stats: bool = False,
+                  restarts: str = None) -> (float, str, [[int]], float, str, int, dict):
     """ 
-    Funcion que toma el string de una instancia de sudoku y
-    lo resuelve.
+    Funcion que toma una instancia de sudoku y la resuelve.
     INPUT:
-        - sat:      String que representa la instancia del sudoku en CNF.
+        - sat:      String que representa la instancia del sudoku en CNF, o
+                    la matriz del sudoku. En el segundo caso las clausulas se
+                    construyen directamente con sudoku_closures, sin pasar por
+                    el texto en CNF.
         - t_max:    Tiempo maximo para la resolucion del sudoku.
+        - core:     Nucleo de busqueda de laura_SAT ("dpll", "watched" o "cdcl").
+        - heuristic: Heuristica de decision de laura_SAT.
+        - reduced:  Indica si se usa la version simplificada con las casillas
+                    dadas (Reduction). Solo aplica si sat es la matriz.
+        - polarity: Polaridad de las decisiones de laura_SAT.
+        - seed:     Semilla para desempatar las decisiones de laura_SAT.
+        - presolve: Indica si se aplica el presolver antes de SAT. Solo aplica
+                    si sat es la matriz.
+        - engine:   Motor de resolucion (ver ENGINES). El motor "exact" solo
+                    aplica si sat es la matriz.
+        - solutions: Numero maximo de soluciones a enumerar (ver solve_formula).
+        - preprocess: Indica si se preprocesa la formula (ver preprocess.py).
+        - stats:    Indica si se recolectan estadisticas de laura_SAT.
+        - restarts: Politica de reinicio de laura_SAT (ver restarts.py).
     OUTPUT:
         - float:  Valor del tiempo
         - str:  Solucion del sudoku (en caso de no expirar el tiempo maximo).
+        - [[int]]:  Matriz de la solucion.
+        - float:  Tiempo de CPU consumido.
+        - str:  Etapa que resolvio la instancia ("presolve", "SAT" o "exact").
+        - int:  Numero de soluciones encontradas, None si solutions es 1. Si
+                es igual a solutions puede haber mas.
+        - dict: Estadisticas de laura_SAT (ver solve_formula).
     """
-    V, C = read_SAT(sat)
-    # Creamos la cola para el multiprocessing.
-    result = multiprocessing.Queue()
-    # Obtenemos el tiempo y la solucion del sudoku.
-    t = timer(get_solution, t_max, V, C, result)
+    # Obtenemos el tiempo y la solucion del sudoku. Las clausulas se construyen
+    # en el proceso que resuelve, y este solo retorna la asignacion empaquetada.
+    t, c, result = timer(solve_formula, t_max, sat, core, heuristic, reduced, polarity, seed,
+                         presolve, engine, False, solutions, preprocess, stats, restarts)
     
     # Si el tiempo es distinto de 0
     if t:
-        V_sol, conflict = result.get()
-        string_solution, m = SAT_to_sudoku(V_sol)
-        return (t, string_solution + " Time: " + str(t),m)
+        return report(result, t, c)
     else:
-        return (0,"Time expired.",[[0]])
+        return EXPIRED
+
+# Configuraciones de laura_SAT que compiten en el modo portafolio:
+# (nucleo, heuristica, polaridad, semilla).
+PORTFOLIO = [
+    ("cdcl", "vsids", None, None),
+    ("cdcl", "jw", None, None),
+    ("cdcl", "vsids", "neg", 1),
+    ("cdcl", "order", "random", 2),
+    ("watched", "moms", None, None),
+    ("dpll", "order", None, None),
+]
+
+def zchaff_solve(path, problem: str, n: int) -> (bytes, int, str, int, dict):
+    """
+    Resuelve un problema con ZCHAFF dentro de un proceso de sudoku_race y
+    empaqueta su asignacion como solve_formula. Si ZCHAFF no termina con una
+    respuesta (se aborta, alcanza su propio limite o falla) se lanza una
+    excepcion, para que la carrera siga con las demas configuraciones.
+    INPUT:
+        - path:      Ubicacion del programa.
+        - problem:   Archivo con la instancia del sudoku en CNF.
+        - n:         Numero de variables del problema.
+    OUTPUT:
+        - (bytes, int, str, int, dict):  Lo mismo que solve_formula.
+    """
+    # Si se cancela el proceso, primero se termina a ZCHAFF (con su grupo de
+    # procesos) y luego el proceso, sin pasar por los manejadores de Python.
+    children = []
+    def cancel(*args):
+        for child in children: os.killpg(child.pid, signal.SIGKILL)
+        os._exit(1)
+    signal.signal(signal.SIGTERM, cancel)
+    children.append(subprocess.Popen(["./zchaff", problem], cwd=path, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, text=True, start_new_session=True))
+    lines = children[0].communicate()[0].split("\n")
+    V = [0]*n
+    if "Instance Satisfiable" in lines:
+        # Las variables sin asignar aparecen entre parentesis y se toman como False.
+        for x in lines[lines.index("Instance Satisfiable") + 1].split():
+            if x[0] == "(": V[int(x[1:-1])-1] = -1
+            else: V[abs(int(x))-1] = 1 if int(x) > 0 else -1
+    elif "Instance Unsatisfiable" not in lines:
+        raise Exception("ZCHAFF no resolvio la instancia.")
+    return pack_solution(V), n, "ZCHAFF", None, None
 
-def zchaff_run(path,problem) -> str:
+def sudoku_race(sudoku: str, t_max: float, configs: [tuple] = PORTFOLIO,
+                reduced: bool = False, zchaff_path: str = None,
+                presolve: bool = False) -> (float, str, [[int]], float, str, int, dict):
+    """
+    Modo portafolio: resuelve una instancia de sudoku con varias
+    configuraciones de laura_SAT a la vez, cada una en su propio proceso, y
+    opcionalmente con ZCHAFF. Se toma la primera respuesta y se cancelan las
+    demas. Con presolve, el presolver se aplica antes de la carrera, y esta
+    solo se hace si hace falta buscar.
+    INPUT:
+        - sudoku:       String que representa la instancia del sudoku.
+        - t_max:        Tiempo maximo para la resolucion del sudoku.
+        - configs:      Configuraciones (nucleo, heuristica, polaridad, semilla).
+        - reduced:      Indica si laura_SAT usa la version simplificada.
+        - zchaff_path:  Ubicacion de ZCHAFF, None para no incluirlo.
+        - presolve:     Indica si se aplica el presolver antes de la carrera.
+    OUTPUT:
+        - (float, str, [[int]], float):  Lo mismo que sudoku_solver, donde el
+                                         tiempo es el de la carrera completa y
+                                         el de CPU el de la ganadora.
+        - str:  Configuracion ganadora ("presolve" si no hizo falta la carrera).
+                Si todas las configuraciones fallan se retorna el resultado
+                de failed, para que las demas instancias continuen.
+        - int:  None (el portafolio no enumera soluciones).
+        - dict: None (el portafolio no recolecta estadisticas).
+    """
+    t = perf_counter()
+    sudoku_matrix = read_sudoku(sudoku)
+    if presolve:
+        c = cpu_time()
+        p = Presolver(sudoku_matrix)
+        if p.solve() or p.conflict:
+            V = [0]*len(sudoku_matrix)**3 if p.conflict else p.assignment()
+            string_solution, m = SAT_to_sudoku(V)
+            t = perf_counter() - t
+            return (t, string_solution + " Time: " + str(t), m, cpu_time() - c, "presolve", None, None)
+        sudoku_matrix = p.matrix()
+
+    contenders = []
+    for core, heuristic, polarity, seed in configs:
+        label = ",".join(str(x) for x in (core, heuristic, polarity, seed) if x is not None)
+        contenders.append((label, solve_formula, (sudoku_matrix, core, heuristic, reduced, polarity, seed)))
+    problem = None
+    if zchaff_path:
+        with tempfile.NamedTemporaryFile("w", suffix=".cnf", delete=False) as f:
+            f.write(sudoku_to_SAT(sudoku_matrix))
+        problem = f.name
+        contenders.append(("ZCHAFF", zchaff_solve, (zchaff_path, problem, len(sudoku_matrix)**3)))
+
+    running = {}
+    for label, f, args in contenders:
+        receiver, sender = multiprocessing.Pipe(False)
+        h = multiprocessing.Process(target=run_timed, args=(sender, f, args))
+        h.start()
+        sender.close()
+        running[receiver] = (label, h)
+    procs = [h for _, h in running.values()]
+    try:
+        # Esperamos bloqueados a la primera respuesta. Si un proceso termina
+        # sin responder (por un error), seguimos con los demas.
+        while running:
+            remaining = t_max - (perf_counter() - t)
+            if remaining <= 0: break
+            for receiver in wait(list(running), remaining):
+                label, h = running.pop(receiver)
+                try: result, _, c = receiver.recv()
+                except EOFError: continue
+                t = perf_counter() - t
+                string_solution, m = decode(result)
+                return (t, string_solution + " Time: " + str(t), m, c, label, None, None)
+        if not running: return failed("Ninguna configuracion del portafolio retorno una solucion.")
+        return EXPIRED
+    finally:
+        for h in procs:
+            if h.is_alive(): h.terminate()
+        for h in procs: h.join()
+        if problem: os.remove(problem)
+
+def zchaff_run(path, problem: str, t_max: float) -> (float, float):
     """ 
     Funcion que toma el string en formato CNF de una instancia de sudoku y
-    lo resuelve con ZCHAFF.
+    lo resuelve con ZCHAFF. El problema se escribe en un archivo temporal y el
+    tiempo maximo lo aplica subprocess, que espera bloqueado y mata a ZCHAFF si
+    se alcanza.
     INPUT:
         - path:      Ubicacion del programa
         - problem:   String que representa la instancia del sudoku en CNF.
+        - t_max:     Tiempo maximo.
+    OUTPUT:
+        - float:    Tiempo que tardo ZCHAFF. 0 en caso de que alcance el
+                    tiempo maximo o no se pueda ejecutar (por ejemplo, si no
+                    esta compilado para esta arquitectura), de modo que solo
+                    falla esa instancia.
+        - float:    Tiempo de CPU que consumio ZCHAFF.
     """
-    # Cambiamos de directorio al de zchaff
-    os.chdir('./'+path)
-    # Ejecutamos el programa
-    subprocess.run(["./zchaff", problem], capture_output=True)
-    os.chdir('../')
+    with tempfile.NamedTemporaryFile("w", suffix=".cnf", delete=False) as f:
+        f.write(problem)
+    try:
+        t, c = perf_counter(), cpu_time()
+        try:
+            subprocess.run(["./zchaff", f.name], cwd=path, capture_output=True, timeout=t_max)
+            t = perf_counter() - t
+        except (OSError, subprocess.SubprocessError):
+            # Incluye subprocess.TimeoutExpired.
+            t = 0
+        return t, cpu_time() - c
+    finally:
+        os.remove(f.name)
+
+def plot_times(path: str, label: str, times: [[int], [float]], fails: [[int], [float]],
+               zchaff_times: [[int], [float]] = None):
+    """
+    Grafica el tiempo de cada instancia y guarda la grafica en un archivo.
+    matplotlib se importa solo al llamar a esta funcion, y se usa su Figure
+    sin pyplot, de modo que no hace falta una pantalla.
+    INPUT:
+        - path:         Archivo donde se guarda la grafica (el formato se
+                        toma de su extension).
+        - label:        Nombre del resolvedor.
+        - times:        Instancias resueltas y sus tiempos.
+        - fails:        Instancias que alcanzaron el tiempo maximo y dicho tiempo.
+        - zchaff_times: Instancias y tiempos de ZCHAFF, None si no se ejecuto.
+    """
+    from matplotlib.figure import Figure
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.set_ylabel("Segundos")
+    ax.set_xlabel("Instancias")
+    if zchaff_times:
+        fig.suptitle('ZCHAFF vs ' + label.upper())
+        ax.set_yscale('log')
+    else: fig.suptitle(label.upper())
+    ax.plot(times[0], times[1], 'bo', label=label)
+    ax.plot(fails[0], fails[1], 'ro', label=label + ' expired')
+    if zchaff_times: ax.plot(zchaff_times[0], zchaff_times[1], 'go', label='ZCHAFF')
+    ax.legend()
+    fig.savefig(path)
 
 def compile_zchaff(path):
     """ 
@@ -134,16 +627,61 @@ def compile_zchaff(path):
     os.chdir('../')
 
 if __name__ == "__main__":
+    core = get_option(argv, "--core", "dpll")
+    heuristic = get_option(argv, "--heuristic", "order")
+    workers = int(get_option(argv, "--workers", "0")) or None
+    polarity = get_option(argv, "--polarity")
+    seed = get_option(argv, "--seed")
+    if seed is not None: seed = int(seed)
+    reduced = "--reduced" in argv
+    if reduced: argv.remove("--reduced")
+    portfolio = "--portfolio" in argv
+    if portfolio: argv.remove("--portfolio")
+    presolve = "--presolve" in argv
+    if presolve: argv.remove("--presolve")
+    incremental = "--incremental" in argv
+    if incremental: argv.remove("--incremental")
+    solutions = int(get_option(argv, "--solutions", "1"))
+    preprocess = "--preprocess" in argv
+    if preprocess: argv.remove("--preprocess")
+    stats = "--stats" in argv
+    if stats: argv.remove("--stats")
+    restarts = get_option(argv, "--restarts")
+    engine = get_option(argv, "--engine", "sat")
+    cache_path = get_option(argv, "--cache")
+    cache_size = int(get_option(argv, "--cache-size", "10000"))
+    # Archivo donde se guarda la grafica de tiempos, None para no graficar.
+    plot_path = get_option(argv, "--plot")
+    # La cache y el portafolio no cuentan soluciones.
+    if solutions > 1: cache_path = None
+    cache = SudokuCache(cache_path, cache_size) if cache_path else None
+    if engine not in ENGINES:
+        raise Exception("El motor debe ser uno de: " + ", ".join(ENGINES))
+    # El portafolio solo compite con configuraciones de laura_SAT.
+    if engine == "exact" or solutions > 1: portfolio = False
+    label = "laura_SAT"
+    if engine == "exact": label = "exact_cover"
+    elif portfolio: label += "[portfolio]"
+    elif core != "dpll" or heuristic != "order" or polarity or seed is not None or restarts:
+        label += "[" + ",".join(str(x) for x in (core, heuristic, polarity, seed, restarts) if x is not None) + "]"
+    if incremental and engine == "sat" and not portfolio: label += "[incremental]"
     if len(argv) == 1:
         sudoku = input("Escriba la instancia del sudoku (enter para cancelar): ")
         t = float("0" + input("Indique el tiempo maximo de ejecucion (enter para cancelar): "))
         while sudoku and t:
-            # Obtenemos la representacion matricial del sudoku.
-            sudoku_matrix = read_sudoku(sudoku)
-            # Obtenemos la representacion en SAT del sudoku.
-            sat = sudoku_to_SAT(sudoku_matrix)
-            time, string_solution, solve_matrix = sudoku_solver(sat, t)
-            print(string_solution + "\n")
+            if portfolio:
+                solve_one = lambda s: sudoku_race(s, t, PORTFOLIO, reduced, None, presolve)
+            else:
+                solve_one = lambda s: sudoku_solver(read_sudoku(s), t, core, heuristic, reduced, polarity, seed,
+                                                    presolve, engine, solutions, preprocess, stats,
+                                                    restarts)
+            solve = lambda ss: map(solve_one, ss)
+            results = cached([sudoku], cache, solve) if cache else solve([sudoku])
+            time, string_solution, solve_matrix, cpu, stage, count, counters = next(iter(results))
+            if stage and (portfolio or presolve or cache): string_solution += " Solver: " + stage
+            print(string_solution)
+            if counters: print("Stats: " + ", ".join(k + ": " + str(x) for k, x in counters.items()))
+            print()
             sudoku = input("Escriba la instancia del sudoku (enter para cancelar): ")
             t = float("0" + input("Indique el tiempo maximo de ejecucion (enter para cancelar): "))
 
@@ -156,6 +694,10 @@ if __name__ == "__main__":
                 break
         path = "zchaff"
         if zchaff: compile_zchaff(path)
+        # En el modo portafolio ZCHAFF compite en la carrera en lugar de
+        # ejecutarse por separado.
+        zchaff_race = path if zchaff and portfolio else None
+        zchaff = zchaff and not portfolio
         f = open(argv[1], "r")
         sudokus = f.readlines()
         f.close()
@@ -177,50 +719,61 @@ if __name__ == "__main__":
         laura_times = [[],[]]
         laura_fails = [[],[]]
         if zchaff: zchaff_times = [[],[]]
-        for s in sudokus:
-            # Verificamos que no sean un salto de linea.
-            if len(s) > 2:
-                # Obtenemos la representacion matricial del sudoku.
-                sudoku_matrix = read_sudoku(s[:-1])
-                # Obtenemos la representacion en SAT del sudoku.
-                sat = sudoku_to_SAT(sudoku_matrix)
-                time_laura, to_file, solve_matrix = sudoku_solver(sat, t)
-                if zchaff: time_zchaff = timer(zchaff_run, t, path,sat)
-                f.write(to_file + "\n")
-                print(">>> INSTANCIA ["+ str(instancia)+"]")
-                sudoku_instance = ">>> SUDOKU [" + str(instancia)+"]\n" + print_sudoku(sudoku_matrix)
-                g.write(sudoku_instance)
-                if time_laura != 0:
-                    print("\tlaura_SAT time: " + str(time_laura))
-                    g.write("Solucion: \n" + print_sudoku(solve_matrix) + "\n")
-                    laura_times[0].append(instancia)
-                    laura_times[1].append(time_laura)
-                else:
-                    print("\tlaura_SAT time: " + to_file)
-                    g.write("Solucion: " + to_file + "\n")
-                    laura_fails[0].append(instancia)
-                    laura_fails[1].append(t)
-                if zchaff:
-                    print("\tZCHAFF time: " + str(time_zchaff))
-                    zchaff_times[0].append(instancia)
-                    zchaff_times[1].append(time_zchaff)
-                instancia += 1
-        # Plotting
+        # Verificamos que no sean un salto de linea.
+        sudokus = [s[:-1] for s in sudokus if len(s) > 2]
+        if portfolio:
+            solve = lambda ss: (sudoku_race(s, t, PORTFOLIO, reduced, zchaff_race, presolve) for s in ss)
+        else:
+            solve = lambda ss: sudoku_solver_batch(ss, t, core, heuristic, reduced, workers, polarity, seed,
+                                                   presolve, engine, incremental, solutions, preprocess, stats,
+                                                   restarts)
+        results = cached(sudokus, cache, solve) if cache else solve(sudokus)
+        stages = {}
+        counts = {}
+        for s, (time_laura, to_file, solve_matrix, cpu_laura, stage, count, counters) in zip(sudokus, results):
+            # Obtenemos la representacion matricial del sudoku.
+            sudoku_matrix = read_sudoku(s)
+            # Solo ZCHAFF necesita la representacion en SAT del sudoku como texto.
+            if zchaff: time_zchaff, cpu_zchaff = zchaff_run(path, sudoku_to_SAT(sudoku_matrix), t)
+            f.write(to_file + "\n")
+            print(">>> INSTANCIA ["+ str(instancia)+"]")
+            sudoku_instance = ">>> SUDOKU [" + str(instancia)+"]\n" + print_sudoku(sudoku_matrix)
+            g.write(sudoku_instance)
+            if time_laura != 0:
+                print("\t" + label + " time: " + str(time_laura) + " CPU: " + str(cpu_laura))
+                if portfolio or presolve or cache:
+                    print("\tSolved by: " + stage)
+                    stages[stage] = stages.get(stage, 0) + 1
+                if count is not None:
+                    # Si se alcanzo el limite puede haber mas soluciones.
+                    print("\tSolutions: " + str(count) + ("+" if count == solutions else ""))
+                    kind = "SIN SOLUCION" if count == 0 else "UNICAS" if count == 1 else "VARIAS SOLUCIONES"
+                    counts[kind] = counts.get(kind, 0) + 1
+                if counters:
+                    print("\tStats: " + ", ".join(k + ": " + str(x) for k, x in counters.items()))
+                g.write("Solucion: \n" + print_sudoku(solve_matrix) + "\n")
+                laura_times[0].append(instancia)
+                laura_times[1].append(time_laura)
+            else:
+                print("\t" + label + " time: " + to_file)
+                g.write("Solucion: " + to_file + "\n")
+                laura_fails[0].append(instancia)
+                laura_fails[1].append(t)
+            if zchaff:
+                print("\tZCHAFF time: " + str(time_zchaff) + " CPU: " + str(cpu_zchaff))
+                zchaff_times[0].append(instancia)
+                zchaff_times[1].append(time_zchaff)
+            instancia += 1
         suma = 0
         for x in laura_times[1]:
             suma += x
-        print("PROMEDIO TOTAL: ",suma/len(laura_times[1]))
-        plt.ylabel("Segundos")
-        plt.xlabel("Instancias")
-        if zchaff: 
-            plt.suptitle('ZCHAFF vs LAURA_SAT')
-            plt.yscale('log')
-        else: plt.suptitle('LAURA_SAT')
-        plt.plot(laura_times[0], laura_times[1], 'bo' ,label='laura_SAT')
-        plt.plot(laura_fails[0],laura_fails[1] , 'ro', label='laura_SAT expired' )
-        if zchaff: plt.plot(zchaff_times[0], zchaff_times[1], 'go',label='ZCHAFF')
-        plt.legend()
-        plt.show()
+        if laura_times[1]: print("PROMEDIO TOTAL: ",suma/len(laura_times[1]))
+        for stage in stages: print("RESUELTAS CON " + stage + ": ", stages[stage])
+        for kind in counts: print(kind + ": ", counts[kind])
+        if cache: print("CACHE: ", cache.hits, "aciertos,", cache.misses, "fallos")
+        # Plotting
+        if plot_path:
+            plot_times(plot_path, label, laura_times, laura_fails, zchaff_times if zchaff else None)
         g.close()
         f.close()
     else:
@@ -4,6 +4,7 @@
 #       - Amin Arriaga
 
 from sys import argv
+from cnf_io import open_cnf
 
 def read_sudoku(string: str) -> [[int]]:
   """ 
@@ -46,35 +47,94 @@ def F(i: int, j: int, d: int, N: int) -> int:
   """
   return i*N**4 + j*N**2 + d
 
-def plus(i: int, j: int, N: int, k: int) -> (int, int):
+def tables(N: int) -> ([[int]], [[int]]):
   """ 
-  Dada la posicion de una casilla en el tablero de sudoku, retorna la posicion
-  de la siguiente casilla dentro de la misma seccion. Solo gozalo.
+  Precalcula la aritmetica de indices de la representacion en SAT: la base de
+  cada casilla (F(i, j, d, N) = base[i][j] + d) y las bases de las casillas de
+  cada seccion, en orden por filas.
   INPUT:
-    - i:  Fila.
-    - j:  Columna.
     - N:  Grado del trablero de sudoku.
-    - k:  Seccion.
   OUTPUT:
-    - int:  Primera coordenada de la siguiente casilla.
-    - int:  Segunda coordenada de la siguiente casilla.
+    - [[int]]:  Base de cada casilla (i, j).
+    - [[int]]:  Bases de las casillas de cada seccion.
+  """
+  D = N**2
+  base = [[i*D**2 + j*D for j in range(D)] for i in range(D)]
+  boxes = [[base[N*(k//N) + a][N*(k%N) + b] for a in range(N) for b in range(N)]
+           for k in range(D)]
+  return base, boxes
+
+def assignment(sudoku: [[int]]) -> [int]:
+  """ 
+  Asignacion de las N^6 variables de la representacion en SAT que corresponde
+  a un tablero (inversa de SAT_to_sudoku).
+  INPUT:
+    - sudoku:   Matriz del tablero (0 en las casillas vacias).
+  OUTPUT:
+    - [int]:  Valores de las variables (1 True, -1 False).
   """
-  D = N*(k%N) # Desplazamiento por seccion.
-
-  # Si el valor de la siguiente columna alcanza al desplazamiento por seccion
-  # mas el grado del sudoku, significa que debemos pasar a la siguiente fila
-  # por lo que se le aumenta 1. En caso contrario no se le suma nada.
-  sig_i = i+int((j+1)/(D+N))
-
-  # El termino de la izquierda se encarga que la columna no supere el desplazamiento
-  # mas el grado del sudoku, que corresponderia a la ultima columna de la seccion mas 
-  # 1. Sin embargo, dejando solo este termino la columna regresaria a 0 al alcanzar
-  # dicho maximo, por lo tanto, el termino de la derecha notemos que es el mismo que
-  # el de sig_i multiplicado por el desplazamiento, esto significa que al superar
-  # la maxima columna, el termino de la izquierda es 0, y el de la derecha es 1 por 
-  # el desplazamiento, correspondiente a la primera columna de la seccion.
-  sig_j = (j+1)%(D+N) + D*int((j+1)/(D+N))
-  return sig_i, sig_j
+  D = len(sudoku)
+  base, _ = tables(int(round(D**(1/2))))
+  V = [-1]*D**3
+  for i in range(D):
+    for j in range(D):
+      if sudoku[i][j]: V[base[i][j] + sudoku[i][j] - 1] = 1
+  return V
+
+def num_closures(sudoku: [[int]]) -> int:
+  """ 
+  Numero de clausulas de la representacion en SAT de la instancia de sudoku.
+  INPUT:
+    - sudoku:   Matriz que representa la instancia de sudoku.
+  """
+  D = len(sudoku)
+  givens = sum(1 for row in sudoku for x in row if x != 0)
+  pairs = D*(D-1)//2
+  # Instancia, completitud, unicidad, filas y columnas, y secciones.
+  return givens + D**2 + D**2*pairs + 2*D*pairs*D + D*pairs*D
+
+def sudoku_chunks(sudoku: [[int]]) -> str:
+  """ 
+  Generador que retorna por bloques el texto de las clausulas de la
+  representacion en SAT de la instancia de sudoku. Cada bloque se arma con un
+  join sobre indices precalculados, en lugar de concatenar literal por literal.
+  INPUT:
+    - sudoku:   Matriz que representa la instancia de sudoku.
+  OUTPUT:
+    - str:  Bloque de clausulas, una por linea.
+  """
+  N = int(round(len(sudoku)**(1/2)))
+  D = N**2
+  base, boxes = tables(N)
+  digits = range(1, D+1)
+  pairs = [(d, dp) for d in digits for dp in range(d+1, D+1)]
+  neg = ["-" + str(v) for v in range(D**3+1)]
+
+  for i in range(D):
+    for j in range(D):
+      b = base[i][j]
+      # Instancia del Sudoku.
+      if sudoku[i][j] != 0:
+        yield str(b + sudoku[i][j]) + " 0\n"
+      # Completitud.
+      yield " ".join([str(b + d) for d in digits]) + " 0\n"
+      # Unicidad.
+      yield "".join([neg[b+d] + " " + neg[b+dp] + " 0\n" for d, dp in pairs])
+
+  # Validez (filas y columnas).
+  for i in range(D):
+    for j in range(D):
+      for jp in range(j+1, D):
+        r, rp, c, cp = base[i][j], base[i][jp], base[j][i], base[jp][i]
+        yield "".join([neg[r+d] + " " + neg[rp+d] + " 0\n" + 
+                       neg[c+d] + " " + neg[cp+d] + " 0\n" for d in digits])
+
+  # Validez (secciones).
+  for box in boxes:
+    for x in range(D):
+      for y in range(x+1, D):
+        b, bp = box[x], box[y]
+        yield "".join([neg[b+d] + " " + neg[bp+d] + " 0\n" for d in digits])
 
 def sudoku_to_SAT(sudoku: [[int]]) -> str:
   """ 
@@ -85,79 +145,243 @@ def sudoku_to_SAT(sudoku: [[int]]) -> str:
   OUTPUT:
     - str:  Representacion en SAT de la instancia de sudoku.
   """
-  N = int(len(sudoku)**(1/2))
-  commentary = "c \n"
-  preamble = "p cnf " + str(N**6) + " "
-  C = ""
-  num_C = 0
-
-  # CLAUSULAS:
-  for i in range(N**2):
-    for j in range(N**2):
+  return "".join(SAT_chunks(sudoku))
+
+def SAT_chunks(sudoku: [[int]]) -> str:
+  """ 
+  Generador con el texto completo (comentario, encabezado y clausulas) de la
+  representacion en SAT de la instancia de sudoku, para escribirlo por bloques
+  sin armarlo entero en memoria.
+  INPUT:
+    - sudoku:   Matriz que representa la instancia de sudoku.
+  OUTPUT:
+    - str:  Bloque de texto.
+  """
+  N = int(round(len(sudoku)**(1/2)))
+  yield "c \n"
+  yield "p cnf " + str(N**6) + " " + str(num_closures(sudoku)) + "\n"
+  yield from sudoku_chunks(sudoku)
+
+def sudoku_closures(sudoku: [[int]]) -> [int]:
+  """ 
+  Generador que, dada una instancia de sudoku representada en una matriz,
+  retorna una por una las clausulas de su representacion en SAT, en el mismo
+  orden que sudoku_to_SAT. Permite construir las estructuras del resolvedor
+  (laura_SAT.build_SAT) sin formatear ni leer el texto en formato cnf.
+  INPUT:
+    - sudoku:   Matriz que representa la instancia de sudoku.
+  OUTPUT:
+    - [int]:  Literales de cada clausula.
+  """
+  N = int(round(len(sudoku)**(1/2)))
+  D = N**2
+  base, boxes = tables(N)
+  digits = range(1, D+1)
+  pairs = [(d, dp) for d in digits for dp in range(d+1, D+1)]
+
+  for i in range(D):
+    for j in range(D):
+      b = base[i][j]
       # Instancia del Sudoku.
       if sudoku[i][j] != 0:
-        C += str(F(i, j, sudoku[i][j], N)) + " 0\n"
-        num_C += 1
-
+        yield [b + sudoku[i][j]]
       # Completitud.
-      for d in range(1, N**2+1):
-        C += str(F(i, j, d, N)) + " "
-      C += "0\n"
-      num_C += 1
-
+      yield [b + d for d in digits]
       # Unicidad.
-      for d in range(1, N**2+1):
-        for dp in range(d+1, N**2+1):
-          C += str(-F(i,j,d,N)) + " " + str(-F(i,j,dp,N)) + " 0\n"
-          num_C += 1
-
+      for d, dp in pairs:
+        yield [-b-d, -b-dp]
 
   # Validez (filas y columnas).
-  for i in range(N**2):
-    for j in range(N**2):
-      for jp in range(j+1, N**2):
-        for d in range(1, N**2+1):
-          C += str(-F(i, j, d, N)) + " " + str(-F(i, jp, d, N)) + " 0\n"
-          C += str(-F(j, i, d, N)) + " " + str(-F(jp, i, d, N)) + " 0\n"
-          num_C += 2
+  for i in range(D):
+    for j in range(D):
+      for jp in range(j+1, D):
+        r, rp, c, cp = base[i][j], base[i][jp], base[j][i], base[jp][i]
+        for d in digits:
+          yield [-r-d, -rp-d]
+          yield [-c-d, -cp-d]
 
   # Validez (secciones).
-  for k in range(N**2):
-    i, j = N*int(k/N), N*(k%N)
-    ip, jp = i, j+1
-    while i != N*(int(k/N) + 1)-1 or j != N*(k%N + 1)-1:
-      for d in range(1, N**2+1):
-        C += str(-F(i, j, d, N)) + " " + str(-F(ip, jp, d, N)) + " 0\n"
-        num_C += 1
+  for box in boxes:
+    for x in range(D):
+      for y in range(x+1, D):
+        b, bp = box[x], box[y]
+        for d in digits:
+          yield [-b-d, -bp-d]
+
+class Reduction:
+  """
+  Clase que representara la version simplificada de la representacion en SAT
+  de una instancia de sudoku, donde las casillas dadas se aplican al generar
+  las clausulas: solo se crean variables para los candidatos vivos (digitos
+  que no aparecen en la fila, columna o seccion de una casilla vacia), se
+  renumeran de 1 a n, y se omiten las clausulas ya satisfechas por las dadas.
+  """
+  def __init__(self, sudoku: [[int]]):
+    """
+    Se inicializan los siguientes parametros:
+      self.sudoku:      Matriz de la instancia de sudoku.
+      self.N:           Grado del tablero de sudoku.
+      self.variables:   Indice original (F(i, j, d, N)) de cada variable viva;
+                        la variable v de la version simplificada es
+                        self.variables[v-1].
+      self.cells:       Variables vivas de cada casilla vacia, con su digito.
+      self.n:           Numero de variables de la version simplificada.
+      self.conflict:    Indica si las casillas dadas se contradicen o dejan una
+                        casilla sin candidatos (la instancia no tiene solucion).
+    INPUT:
+      - sudoku:   Matriz que representa la instancia de sudoku.
+    """
+    N = int(round(len(sudoku)**(1/2)))
+    D = N**2
+    base, _ = tables(N)
+    self.sudoku, self.N = sudoku, N
+    self.variables = []
+    self.cells = {}
+    self.conflict = False
+
+    # Digitos usados en cada fila, columna y seccion.
+    rows, cols, boxes = [set() for _ in range(D)], [set() for _ in range(D)], [set() for _ in range(D)]
+    for i in range(D):
+      for j in range(D):
+        d = sudoku[i][j]
+        if d == 0: continue
+        k = N*(i//N) + j//N
+        if d in rows[i] or d in cols[j] or d in boxes[k]: self.conflict = True
+        rows[i].add(d); cols[j].add(d); boxes[k].add(d)
+
+    # Candidatos vivos de cada casilla vacia.
+    for i in range(D):
+      for j in range(D):
+        if sudoku[i][j] != 0: continue
+        used = rows[i] | cols[j] | boxes[N*(i//N) + j//N]
+        live = []
+        for d in range(1, D+1):
+          if d not in used:
+            self.variables.append(base[i][j] + d)
+            live.append((d, len(self.variables)))
+        if not live: self.conflict = True
+        self.cells[(i, j)] = live
+    self.n = len(self.variables)
+    # Las formulas trivialmente insatisfacible (con conflicto) y satisfacible
+    # (sin casillas vacias) usan una variable.
+    self.n = max(self.n, 1)
+
+  def closures(self) -> [int]:
+    """ 
+    Generador con las clausulas de la version simplificada: completitud y
+    unicidad de cada casilla vacia sobre sus candidatos, y validez de cada
+    digito entre las casillas vacias de cada fila, columna y seccion donde es
+    candidato (sin repetir los pares que comparten fila o columna dentro de
+    una seccion). Si la instancia no tiene solucion se retorna una formula
+    trivialmente insatisfacible, y si no tiene casillas vacias una
+    trivialmente satisfacible (el formato cnf no admite formulas vacias).
+    OUTPUT:
+      - [int]:  Literales de cada clausula.
+    """
+    if self.conflict:
+      yield [1]
+      yield [-1]
+      return
+    if not self.variables:
+      yield [1]
+      return
+
+    N, D, cells = self.N, self.N**2, self.cells
+    for live in cells.values():
+      # Completitud.
+      yield [v for _, v in live]
+      # Unicidad.
+      for x in range(len(live)):
+        for y in range(x+1, len(live)):
+          yield [-live[x][1], -live[y][1]]
+
+    # Variable de cada digito candidato de cada casilla vacia.
+    digit = {}
+    for (i, j), live in cells.items():
+      for d, v in live: digit[(i, j, d)] = v
+
+    def at_most_one(group, same_line):
+      """ Clausulas de validez entre las casillas de un grupo. """
+      for d in range(1, D+1):
+        vs = [(cell, digit[cell + (d,)]) for cell in group if cell + (d,) in digit]
+        for x in range(len(vs)):
+          for y in range(x+1, len(vs)):
+            if not same_line(vs[x][0], vs[y][0]):
+              yield [-vs[x][1], -vs[y][1]]
 
-      if ip == N*(int(k/N) + 1)-1 and jp == N*(k%N + 1)-1:
-        i, j = plus(i, j, N, k)
-        ip, jp = i, j
-      
-      ip, jp = plus(ip, jp, N, k)
+    never = lambda a, b: False
+    line = lambda a, b: a[0] == b[0] or a[1] == b[1]
+    for i in range(D):
+      yield from at_most_one([(i, j) for j in range(D)], never)
+    for j in range(D):
+      yield from at_most_one([(i, j) for i in range(D)], never)
+    for k in range(D):
+      box = [(N*(k//N) + a, N*(k%N) + b) for a in range(N) for b in range(N)]
+      yield from at_most_one(box, line)
 
-  preamble += str(num_C) + "\n"
-  return commentary + preamble + C
+  def expand(self, V: [int]) -> [int]:
+    """ 
+    Traduce una asignacion de la version simplificada a la asignacion completa
+    de las N^6 variables de sudoku_to_SAT, agregando las casillas dadas. Si
+    la instancia no tiene solucion (V es la asignacion vacia de laura_SAT, toda
+    en 0) se retorna la asignacion vacia de las N^6 variables.
+    INPUT:
+      - V:  Valores de las variables vivas (1 True, -1 False).
+    OUTPUT:
+      - [int]:  Valores de las N^6 variables.
+    """
+    N, D = self.N, self.N**2
+    if self.conflict or not any(V): return [0]*N**6
+    full = [-1]*N**6
+    base, _ = tables(N)
+    for i in range(D):
+      for j in range(D):
+        if self.sudoku[i][j] != 0: full[base[i][j] + self.sudoku[i][j] - 1] = 1
+    for v, x in enumerate(V[:len(self.variables)]):
+      if x == 1: full[self.variables[v] - 1] = 1
+    return full
 
+  def to_SAT(self) -> str:
+    """ 
+    Retorna la version simplificada en formato cnf. La correspondencia con las
+    variables originales se guarda en un comentario 'c map'.
+    """
+    closures = ["".join(str(l) + " " for l in c) + "0\n" for c in self.closures()]
+    return "c map " + " ".join(str(v) for v in self.variables) + "\n" + \
+           "p cnf " + str(self.n) + " " + str(len(closures)) + "\n" + "".join(closures)
 
 if __name__ == "__main__":
+    reduced = "--reduced" in argv
+    if reduced: argv.remove("--reduced")
+    # Con --stream todas las instancias se escriben en FILE_OUT, una despues de
+    # la otra (ver laura_SAT.iter_SAT).
+    stream = "--stream" in argv
+    if stream: argv.remove("--stream")
+    # laura_SAT.iter_SAT descarta los comentarios, y con ellos el 'c map' que
+    # hace falta para reconstruir cada tablero de la version simplificada.
+    if stream and reduced: raise Exception("--stream no se puede combinar con --reduced.")
     if len(argv) == 1:
         sudoku = input("Escriba la instancia del sudoku (enter para cancelar): ")
         while sudoku:
-            print(sudoku_to_SAT(read_sudoku(sudoku)))
+            if reduced: print(Reduction(read_sudoku(sudoku)).to_SAT())
+            else: print(sudoku_to_SAT(read_sudoku(sudoku)))
             sudoku = input("Escriba la instancia del sudoku (enter para cancelar): ")
     elif len(argv) == 3:
-        f = open(argv[1], "r")
-        sudokus = f.readlines()
-        f.close()
+        # Las instancias se leen una por una, sin cargar todo el archivo.
+        sudokus = open(argv[1], "r")
+        out = open_cnf(argv[2], "w") if stream else None
 
         i = 0
         for s in sudokus:
             if len(s) > 2:
-                if i == 0: f = open(argv[2], "w")
+                if stream: f = out
+                elif i == 0: f = open(argv[2], "w")
                 else: f = open(argv[2] + "(" + str(i) + ")", "w")
-                f.write(sudoku_to_SAT(read_sudoku(s[:-1])))
+                if reduced: f.write(Reduction(read_sudoku(s.strip())).to_SAT())
+                else: f.writelines(SAT_chunks(read_sudoku(s.strip())))
                 i += 1
-                f.close()
+                if not stream: f.close()
+        sudokus.close()
+        if stream: out.close()
     else:
         raise Exception("Numero de argumentos invalidos.")
@@ -0,0 +1,676 @@
+#  Nucleo de propagacion con dos literales vigilados para laura_SAT.
+#  Autores:
+#       - David Segura
+#       - Amin Arriaga
+
+from array import array
+from clause_db import ClauseDB
+from heuristics import make_heuristic
+from restarts import RESTARTS, make_restarts
+
+# Clausulas aprendidas permitidas antes de la primera reduccion (ver
+# Watched.reduce), y cuanto crece el limite despues de cada reduccion.
+REDUCE_FIRST = 2000
+REDUCE_INC = 300
+
+class Watched:
+  """
+  Clase que representara un problema CNF con el esquema de dos literales vigilados.
+  Cada clausula (de al menos dos literales) vigila sus dos primeras posiciones, de
+  modo que al asignar una variable solo se visitan las clausulas que vigilan el
+  literal que quedo falso.
+  Los arreglos indexados por literal tienen tamaño 2n+1: el literal l > 0 esta en
+  la posicion l y el literal -l en la posicion -l (contando desde el final).
+  """
+  def __init__(self, n: int, closures, heuristic: str = "order", polarity: str = None,
+               seed: int = None, stats = None, restarts: str = None):
+    """
+    Se inicializan los siguientes parametros:
+      self.n:         Numero de variables.
+      self.value:     Valor de cada literal (1 True, -1 False, 0 sin asignar).
+      self.watches:   Clausulas que vigilan cada literal.
+      self.closures:  Clausulas del problema con al menos dos literales.
+      self.units:     Literales de las clausulas unitarias.
+      self.trail:     Literales asignados en orden cronologico.
+      self.trail_lim: Posicion del trail donde comienza cada nivel de decision.
+      self.qhead:     Posicion del trail del siguiente literal a propagar.
+      self.empty:     Indica si el problema tiene (o implica) una clausula vacia.
+      self.level:     Nivel de decision en el que se asigno cada variable.
+      self.reason:    Clausula que obligo la asignacion de cada variable (None
+                      si fue una decision). El literal implicado es el primero.
+      self.learnts:   Clausulas aprendidas en los conflictos (modo cdcl).
+      self.lbd:       LBD de cada clausula aprendida: numero de niveles de
+                      decision distintos entre sus literales al aprenderla.
+      self.max_learnts: Clausulas aprendidas permitidas antes de reducirlas.
+      self.assumptions: Literales supuestos en la llamada actual a solve.
+      self.models:    Modelos encontrados al enumerar (None si no se enumera).
+      self.limit:     Numero maximo de modelos a enumerar (None sin limite).
+      self.project:   Variables sobre las que se distinguen los modelos.
+      self.heuristic: Heuristica de decision.
+      self.stats:     Estadisticas de la busqueda (ver solver_stats.py), None
+                      para no recolectarlas.
+      self.restarts:  Politica de reinicio de cada busqueda (ver
+                      restarts.RESTARTS), None para no reiniciar.
+    INPUT:
+      - n:          Numero de variables.
+      - closures:   Iterable con las clausulas como listas de enteros.
+      - heuristic:  Nombre de la heuristica de decision (ver heuristics.HEURISTICS).
+      - polarity:   Polaridad de las decisiones (ver heuristics.POLARITIES).
+      - seed:       Semilla para desempatar al azar las decisiones.
+      - stats:      Estadisticas de la busqueda.
+      - restarts:   Politica de reinicio.
+    """
+    self.n = n
+    self.value = [0]*(2*n+1)
+    self.init_clauses()
+    self.units = []
+    self.trail = []
+    self.trail_lim = []
+    self.qhead = 0
+    self.empty = False
+    self.level = [0]*(n+1)
+    self.reason = [None]*(n+1)
+    self.learnts = []
+    self.lbd = []
+    self.max_learnts = REDUCE_FIRST
+    self.seen = bytearray(n+1)
+    self.assumptions = []
+    self.models, self.limit, self.project = None, None, range(1, n+1)
+    for c in closures: self.add_closure(c)
+    self.heuristic = make_heuristic(heuristic, n, self.closures, None, polarity, seed)
+    self.stats = stats
+    if restarts not in RESTARTS:
+      raise Exception("La politica de reinicio debe ser una de: " + ", ".join(r for r in RESTARTS if r))
+    self.restarts = restarts
+
+  def init_clauses(self):
+    """ Crea las estructuras de las clausulas: self.closures y las listas de
+    vigilancia de cada literal (self.watches). """
+    self.closures = []
+    self.watches = [[] for _ in range(2*self.n+1)]
+
+  def attach(self, c: [int], learnt: bool = False):
+    """
+    Guarda una clausula de al menos dos literales y la agrega a las listas de
+    vigilancia de sus dos primeros literales.
+    INPUT:
+      - c:        Literales de la clausula.
+      - learnt:   Indica si es una clausula aprendida.
+    OUTPUT:
+      - [int]:  La clausula como se guarda, que es la que queda como razon de
+                sus implicaciones (ver clause).
+    """
+    (self.learnts if learnt else self.closures).append(c)
+    self.watches[c[0]].append(c)
+    self.watches[c[1]].append(c)
+    return c
+
+  def clause(self, r) -> [int]:
+    """ Literales de una clausula guardada por attach (por ejemplo, una
+    razon), con el literal implicado en la primera posicion. """
+    return r
+
+  def add_closure(self, literales: [int]):
+    """
+    Agrega una clausula al problema, eliminando literales repetidos y descartando
+    las tautologias.
+    INPUT:
+      - literales:  Literales de la clausula.
+    """
+    c = []
+    seen = set()
+    for l in literales:
+      if abs(l) > self.n:
+        raise Exception("Se indicaron", self.n, "variables, pero aparece la variable", l)
+      if -l in seen: return
+      if l not in seen:
+        seen.add(l)
+        c.append(l)
+    if len(c) == 0: self.empty = True
+    elif len(c) == 1: self.units.append(c[0])
+    else: self.attach(c)
+
+  def assign(self, l: int, reason: [int] = None) -> bool:
+    """
+    Hace True el literal l y lo agrega al trail.
+    INPUT:
+      - l:       Literal.
+      - reason:  Clausula que obliga la asignacion (como la guarda attach),
+                 None si es una decision.
+    OUTPUT:
+      - bool: Indica si hubo un conflicto (el literal ya era False).
+    """
+    v = self.value[l]
+    if v: return v < 0
+    self.value[l] = 1
+    self.value[-l] = -1
+    self.level[abs(l)] = len(self.trail_lim)
+    self.reason[abs(l)] = reason
+    self.trail.append(l)
+    return False
+
+  def propagate(self) -> [int]:
+    """
+    Propaga los literales del trail que aun no se han procesado. Por cada literal
+    que queda falso solo se recorren las clausulas que lo vigilan.
+    OUTPUT:
+      - [int]:  Clausula con todos sus literales False en caso de conflicto, None
+                en caso contrario.
+    """
+    value, watches, trail = self.value, self.watches, self.trail
+    level, reason, d = self.level, self.reason, len(self.trail_lim)
+    while self.qhead < len(trail):
+      false_l = -trail[self.qhead]
+      self.qhead += 1
+      ws = watches[false_l]
+      i = 0
+      while i < len(ws):
+        c = ws[i]
+        # Dejamos el literal falso en la segunda posicion.
+        if c[0] == false_l: c[0], c[1] = c[1], false_l
+        first = c[0]
+        if value[first] > 0:
+          i += 1
+          continue
+
+        # Buscamos otro literal que no sea False para vigilar.
+        for k in range(2, len(c)):
+          l = c[k]
+          if value[l] >= 0:
+            c[1], c[k] = l, false_l
+            watches[l].append(c)
+            ws[i] = ws[-1]
+            ws.pop()
+            break
+        else:
+          # La clausula es unitaria o esta en conflicto.
+          if value[first] < 0: return c
+          value[first] = 1
+          value[-first] = -1
+          level[abs(first)] = d
+          reason[abs(first)] = c
+          trail.append(first)
+          i += 1
+    return None
+
+  def count_propagate(self) -> [int]:
+    """
+    Lo mismo que propagate, contando en self.stats los literales propagados.
+    Se usa en lugar de propagate solo si se recolectan estadisticas.
+    """
+    q = self.qhead
+    confl = self.propagate()
+    self.stats.propagations += self.qhead - q
+    self.stats.measure(self.trail)
+    return confl
+
+  def backtrack(self, level: int):
+    """
+    Deshace las asignaciones de los niveles mayores a level.
+    INPUT:
+      - level:  Nivel de decision al que se regresa.
+    """
+    if len(self.trail_lim) <= level: return
+    value, trail, reason, h = self.value, self.trail, self.reason, self.heuristic
+    pos = self.trail_lim[level]
+    for l in trail[pos:]:
+      value[l] = 0
+      value[-l] = 0
+      reason[abs(l)] = None
+      h.unassign(l)
+    del trail[pos:]
+    del self.trail_lim[level:]
+    self.qhead = pos
+
+  def decide(self, l: int):
+    """
+    Abre un nuevo nivel de decision asignando el literal l.
+    INPUT:
+      - l:  Literal de decision.
+    """
+    self.trail_lim.append(len(self.trail))
+    self.assign(l)
+
+  def free(self, k: int) -> bool:
+    """
+    Indica si la k-esima variable esta sin asignar.
+    """
+    return self.value[k] == 0
+
+  def model(self) -> [int]:
+    """
+    Retorna el signo de cada variable, tomando como False las no asignadas.
+    """
+    return [1 if self.value[k] > 0 else -1 for k in range(1, self.n+1)]
+
+  def analyze(self, confl: [int]) -> ([int], int):
+    """
+    Analisis de conflictos 1-UIP: recorre el trail hacia atras resolviendo la
+    clausula en conflicto con las razones de sus literales del nivel actual hasta
+    que quede un solo literal de dicho nivel (el primer punto de implicacion unico).
+    Las variables que participan se notifican a la heuristica.
+    INPUT:
+      - confl:  Clausula en conflicto.
+    OUTPUT:
+      - [int]:  Clausula aprendida, con el literal que se afirma en la primera
+                posicion y el de mayor nivel (despues de el) en la segunda.
+      - int:    Nivel al que se debe regresar.
+    """
+    seen, level, reason, trail = self.seen, self.level, self.reason, self.trail
+    d = len(self.trail_lim)
+    learnt = [0]
+    involved = []
+    counter = 0
+    p = 0
+    i = len(trail) - 1
+    while True:
+      for q in (confl if p == 0 else confl[1:]):
+        v = abs(q)
+        if not seen[v] and level[v] > 0:
+          seen[v] = 1
+          involved.append(q)
+          if level[v] >= d: counter += 1
+          else: learnt.append(q)
+      # Siguiente literal del nivel actual que participa en el conflicto.
+      while not seen[abs(trail[i])]: i -= 1
+      p = trail[i]
+      i -= 1
+      seen[abs(p)] = 0
+      counter -= 1
+      if counter == 0: break
+      confl = self.clause(reason[abs(p)])
+    learnt[0] = -p
+    self.heuristic.conflict(involved)
+
+    # Eliminamos los literales implicados por otros literales de la clausula.
+    keep = [learnt[0]]
+    for q in learnt[1:]:
+      r = reason[abs(q)]
+      if r is None or any(not seen[abs(x)] and level[abs(x)] > 0 for x in self.clause(r)[1:]):
+        keep.append(q)
+    for q in learnt: seen[abs(q)] = 0
+    learnt = keep
+
+    # El nivel de regreso es el mayor nivel entre los demas literales.
+    if len(learnt) == 1: return learnt, 0
+    j = max(range(1, len(learnt)), key=lambda j: level[abs(learnt[j])])
+    learnt[1], learnt[j] = learnt[j], learnt[1]
+    return learnt, level[abs(learnt[1])]
+
+  def learn(self, learnt: [int]):
+    """
+    Agrega una clausula aprendida y afirma su primer literal. Debe llamarse
+    despues de regresar al nivel indicado por analyze.
+    INPUT:
+      - learnt: Clausula aprendida.
+    """
+    if len(learnt) == 1:
+      self.assign(learnt[0])
+      return
+    self.assign(learnt[0], self.attach(learnt, True))
+    level = self.level
+    self.lbd.append(len({level[abs(l)] for l in learnt}))
+
+  def locked(self, c) -> bool:
+    """ Indica si la clausula c (como la guarda attach) es la razon de la
+    asignacion de su primer literal. """
+    return self.reason[abs(c[0])] is c
+
+  def reduce(self):
+    """
+    Elimina la mitad de las clausulas aprendidas, las de mayor LBD. Se conservan
+    siempre las clausulas del problema y las de bloqueo, las aprendidas con LBD
+    de a lo sumo 2 y las que son razon de alguna asignacion actual. Luego el
+    limite de aprendidas crece en REDUCE_INC.
+    """
+    learnts, lbd = self.learnts, self.lbd
+    order = sorted(range(len(learnts)), key=lambda j: lbd[j])
+    keep = bytearray(len(learnts))
+    for j in order[:len(order)//2]: keep[j] = 1
+    removed = []
+    for j, c in enumerate(learnts):
+      if keep[j] or lbd[j] <= 2 or self.locked(c): keep[j] = 1
+      else: removed.append(c)
+    self.learnts = [c for j, c in enumerate(learnts) if keep[j]]
+    self.lbd = [x for j, x in enumerate(lbd) if keep[j]]
+    self.detach(removed)
+    self.max_learnts += REDUCE_INC
+    if self.stats is not None: self.stats.deleted += len(removed)
+
+  def detach(self, removed: list):
+    """
+    Quita las clausulas removed de las listas de vigilancia de sus dos
+    primeros literales, que son los que vigilan.
+    INPUT:
+      - removed:  Clausulas aprendidas a eliminar (como las guarda attach).
+    """
+    gone = {id(c) for c in removed}
+    for l in {l for c in removed for l in c[:2]}:
+      ws = self.watches[l]
+      ws[:] = [c for c in ws if id(c) not in gone]
+
+  def solve(self, mode: str = "dpll", assumptions: [int] = ()) -> ([int], bool):
+    """
+    Resuelve el problema con el modo indicado. Se puede llamar varias veces
+    sobre el mismo objeto con distintas suposiciones: las clausulas aprendidas
+    y los puntajes de la heuristica se conservan entre llamadas, ya que las
+    suposiciones son decisiones y no clausulas del problema.
+    INPUT:
+      - mode:         "dpll" (backtracking cronologico) o "cdcl" (aprendizaje
+                      de clausulas con backjumping no cronologico).
+      - assumptions:  Literales que se suponen True. Se deciden en orden, uno
+                      por nivel, antes que cualquier otra decision.
+    OUTPUT:
+      - [int]:  Valores de las variables en caso de haber solucion.
+      - bool:   Indica si hubo conflictos.
+    """
+    fail = [0 for _ in range(self.n)], True
+    if self.empty: return fail
+    self.backtrack(0)
+    for l in self.units:
+      if self.assign(l): return fail
+    if (self.propagate if self.stats is None else self.count_propagate)() is not None:
+      self.empty = True
+      return fail
+    self.assumptions = list(assumptions)
+    if mode == "dpll": sat = self.dpll()
+    elif mode == "cdcl": sat = self.cdcl()
+    else: raise Exception("El modo debe ser 'dpll' o 'cdcl'.")
+    return (self.model(), False) if sat else fail
+
+  def enumerate_models(self, mode: str = "dpll", limit: int = None, project: [int] = None,
+                       assumptions: [int] = ()) -> [[int]]:
+    """
+    Enumera los modelos del problema. Cada vez que se encuentra uno se agrega
+    una clausula que lo bloquea (la negacion de los valores de las variables
+    de project) y la busqueda continua desde el estado actual, como si dicha
+    clausula hubiera causado un conflicto, en lugar de empezar de nuevo. Las
+    clausulas de bloqueo quedan en el problema.
+    INPUT:
+      - mode:         "dpll" o "cdcl" (ver solve).
+      - limit:        Numero maximo de modelos, None para todos.
+      - project:      Variables sobre las que se distinguen los modelos: dos
+                      modelos que solo difieren en las demas cuentan como uno.
+                      Por defecto, todas.
+      - assumptions:  Literales que se suponen True (ver solve).
+    OUTPUT:
+      - [[int]]:  Valores de las variables de cada modelo encontrado.
+    """
+    if limit is not None and limit < 1: return []
+    self.models, self.limit = [], limit
+    self.project = range(1, self.n+1) if project is None else project
+    try:
+      self.solve(mode, assumptions)
+      return self.models
+    finally:
+      self.models, self.limit = None, None
+
+  def record(self) -> bool:
+    """
+    Registra el modelo actual si se esta enumerando.
+    OUTPUT:
+      - bool:   Indica si la busqueda debe terminar (no se enumera o se
+                alcanzo el limite de modelos).
+    """
+    if self.models is None: return True
+    self.models.append(self.model())
+    return self.limit is not None and len(self.models) >= self.limit
+
+  def block(self) -> [int]:
+    """
+    Agrega la clausula que bloquea el modelo actual y regresa al mayor nivel
+    de sus literales, donde queda en conflicto.
+    OUTPUT:
+      - [int]:  Clausula de bloqueo, None si no hay mas modelos (todas las
+                variables de project se deducen sin decisiones).
+    """
+    value, level = self.value, self.level
+    c = [-k if value[k] > 0 else k for k in self.project]
+    if not c: return None
+    # Se vigilan los dos literales de mayor nivel.
+    c.sort(key=lambda l: level[abs(l)], reverse=True)
+    if level[abs(c[0])] <= len(self.assumptions): return None
+    self.backtrack(level[abs(c[0])])
+    if len(c) == 1: self.units.append(c[0])
+    else: self.attach(c)
+    return c
+
+  def next_decision(self) -> int:
+    """
+    Retorna el siguiente literal de decision: la siguiente suposicion mientras
+    queden, y luego el que indique la heuristica. Si una suposicion ya es True
+    se abre un nivel vacio para ella.
+    OUTPUT:
+      - int:  Literal de decision, 0 si todas las variables estan asignadas y
+              None si una suposicion es False.
+    """
+    assumptions = self.assumptions
+    while len(self.trail_lim) < len(assumptions):
+      a = assumptions[len(self.trail_lim)]
+      v = self.value[a]
+      if v < 0: return None
+      if v == 0: return a
+      self.trail_lim.append(len(self.trail))
+    return self.heuristic.pick(self.free)
+
+  def restart(self):
+    """
+    Reinicia la busqueda: deshace todas las decisiones que no son
+    suposiciones, regresando por el trail.
+    """
+    self.backtrack(len(self.assumptions))
+    if self.stats is not None: self.stats.restarts += 1
+
+  def dpll(self) -> bool:
+    """
+    DPLL iterativo con backtracking cronologico sobre el trail: se prueba primero
+    el literal que indica la heuristica y luego su negacion. Con una politica de
+    reinicio, al reiniciar se olvida que signos se probaron, pero la busqueda
+    sigue siendo completa porque los limites de conflictos crecen.
+    OUTPUT:
+      - bool:   Indica si el problema es satisfacible.
+    """
+    h, stats = self.heuristic, self.stats
+    restarts = make_restarts(self.restarts)
+    propagate = self.propagate if stats is None else self.count_propagate
+    # Cada decision guarda su literal y si ya se probo el signo contrario. Las
+    # suposiciones no se pueden cambiar, asi que se marcan como ya probadas.
+    decisions = []
+    while True:
+      k = len(self.trail_lim)
+      l = self.next_decision()
+      if l is None: return False
+      for a in self.assumptions[k:len(self.trail_lim)]: decisions.append([a, True])
+      if l == 0:
+        if self.record(): return True
+        # El modelo bloqueado se trata como un conflicto en su mayor nivel.
+        confl = self.block()
+        if confl is None: return False
+        if len(confl) == 1:
+          # Un bloqueo unitario se asigna en el nivel 0.
+          self.backtrack(0)
+          self.assign(confl[0])
+          confl = propagate()
+        del decisions[len(self.trail_lim):]
+      else:
+        decisions.append([l, len(self.trail_lim) < len(self.assumptions)])
+        self.decide(l)
+        if stats is not None: stats.decision(len(self.trail_lim), self.trail)
+        confl = propagate()
+
+      while confl is not None:
+        h.conflict(confl)
+        if stats is not None: stats.conflict(self.trail)
+        if restarts is not None and len(self.trail_lim) > len(self.assumptions) and restarts.conflict():
+          self.restart()
+          del decisions[len(self.trail_lim):]
+          break
+        # Regresamos a la ultima decision que no haya probado ambos signos.
+        while decisions and decisions[-1][1]: decisions.pop()
+        if not decisions: return False
+        d = decisions[-1]
+        d[1] = True
+        self.backtrack(len(decisions) - 1)
+        if stats is not None: stats.backtracks += 1
+        self.decide(-d[0])
+        confl = propagate()
+
+  def cdcl(self) -> bool:
+    """
+    CDCL: en cada conflicto se aprende una clausula 1-UIP y se regresa al
+    nivel donde esta se vuelve unitaria (backjumping no cronologico). Con una
+    politica de reinicio, despues de aprender se reinicia cuando se alcanza
+    el limite de conflictos.
+    OUTPUT:
+      - bool:   Indica si el problema es satisfacible.
+    """
+    stats = self.stats
+    restarts = make_restarts(self.restarts)
+    propagate = self.propagate if stats is None else self.count_propagate
+    while True:
+      confl = propagate()
+      if confl is None:
+        l = self.next_decision()
+        if l is None: return False
+        if l != 0:
+          self.decide(l)
+          if stats is not None: stats.decision(len(self.trail_lim), self.trail)
+          continue
+        if self.record(): return True
+        # El modelo bloqueado se trata como un conflicto en su mayor nivel.
+        confl = self.block()
+        if confl is None: return False
+      # Un conflicto en el nivel 0 no depende de las suposiciones.
+      if not self.trail_lim:
+        self.empty = True
+        return False
+      if stats is not None: stats.conflict(self.trail)
+      learnt, back = self.analyze(confl)
+      self.backtrack(back)
+      self.learn(learnt)
+      if stats is not None:
+        stats.backtracks += 1
+        stats.learnts += len(learnt) > 1
+      if len(self.learnts) >= self.max_learnts: self.reduce()
+      if restarts is not None and restarts.conflict(): self.restart()
+
+class CompactWatched(Watched):
+  """
+  Version de Watched que resuelve sobre una ClauseDB sin copiar sus clausulas a
+  listas: los literales de todas las clausulas (las del problema, las
+  aprendidas y las de bloqueo) quedan en el arreglo plano self.db.lits, cada
+  clausula se identifica por su indice en la base, y tanto las listas de
+  vigilancia (arreglos de enteros) como las razones guardan esos indices. Los
+  literales vigilados se mueven dentro de lits, como en las listas de Watched.
+  """
+  def init_clauses(self):
+    """
+    Se inicializan los siguientes parametros:
+      self.db:        Base con las clausulas de al menos dos literales.
+      self.closures:  La misma base (la recorre la heuristica al crearse).
+      self.watches:   Indices de las clausulas que vigilan cada literal.
+    """
+    self.db = ClauseDB(self.n)
+    self.closures = self.db
+    self.watches = [array("i") for _ in range(2*self.n+1)]
+
+  def attach(self, c: [int], learnt: bool = False) -> int:
+    i = len(self.db)
+    self.db.add(c)
+    self.watches[c[0]].append(i)
+    self.watches[c[1]].append(i)
+    if learnt: self.learnts.append(i)
+    return i
+
+  def clause(self, r: int) -> [int]:
+    return self.db[r]
+
+  def locked(self, c: int) -> bool:
+    return self.reason[abs(self.db.lits[self.db.offsets[c]])] == c
+
+  def detach(self, removed: [int]):
+    """
+    Elimina las clausulas removed de la base compactando sus arreglos: las
+    clausulas desde la primera eliminada se corren hacia adelante, y se
+    cambian sus indices en las listas de vigilancia, en las aprendidas y en
+    las razones. Las clausulas del problema estan al inicio de la base, asi
+    que no se mueven.
+    INPUT:
+      - removed:  Indices de las clausulas aprendidas a eliminar.
+    """
+    if not removed: return
+    lits, offsets = self.db.lits, self.db.offsets
+    first = min(removed)
+    gone = set(removed)
+    # Nuevo indice de cada clausula desde first (-1 si se elimina).
+    new_id = array("i")
+    tail = lits[offsets[first]:]
+    base = offsets[first]
+    ends = offsets[first+1:]
+    del lits[base:]
+    del offsets[first+1:]
+    start = 0
+    touched = set()
+    for i, end in enumerate(ends, first):
+      end -= base
+      touched.add(tail[start]); touched.add(tail[start+1])
+      if i in gone: new_id.append(-1)
+      else:
+        new_id.append(len(offsets) - 1)
+        lits.extend(tail[start:end])
+        offsets.append(len(lits))
+      start = end
+
+    # Solo vigilan clausulas desde first los literales en sus dos primeras
+    # posiciones.
+    for l in touched:
+      ws = self.watches[l]
+      self.watches[l] = array("i", [c if c < first else new_id[c-first] for c in ws
+                                    if c < first or new_id[c-first] >= 0])
+    self.learnts = [new_id[c-first] if c >= first else c for c in self.learnts]
+    reason = self.reason
+    for l in self.trail:
+      r = reason[abs(l)]
+      if r is not None and r >= first: reason[abs(l)] = new_id[r-first]
+
+  def propagate(self) -> [int]:
+    value, watches, trail = self.value, self.watches, self.trail
+    level, reason, d = self.level, self.reason, len(self.trail_lim)
+    lits, offsets = self.db.lits, self.db.offsets
+    while self.qhead < len(trail):
+      false_l = -trail[self.qhead]
+      self.qhead += 1
+      ws = watches[false_l]
+      i = 0
+      while i < len(ws):
+        c = ws[i]
+        start = offsets[c]
+        # Dejamos el literal falso en la segunda posicion.
+        if lits[start] == false_l:
+          lits[start] = lits[start+1]
+          lits[start+1] = false_l
+        first = lits[start]
+        if value[first] > 0:
+          i += 1
+          continue
+
+        # Buscamos otro literal que no sea False para vigilar.
+        for k in range(start+2, offsets[c+1]):
+          l = lits[k]
+          if value[l] >= 0:
+            lits[start+1] = l
+            lits[k] = false_l
+            watches[l].append(c)
+            ws[i] = ws[-1]
+            ws.pop()
+            break
+        else:
+          # La clausula es unitaria o esta en conflicto.
+          if value[first] < 0: return lits[start:offsets[c+1]].tolist()
+          value[first] = 1
+          value[-first] = -1
+          level[abs(first)] = d
+          reason[abs(first)] = c
+          trail.append(first)
+          i += 1
+    return None